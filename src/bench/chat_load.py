@@ -0,0 +1,104 @@
+"""
+Load generator for the chat server
+
+Simulates concurrent users, each on its own connection and session, walking through a scripted conversation.
+Reports the latency seen by the clients and the turns per second the server sustained.
+
+Run from the src directory, against a server started with serve.py:
+    python -m bench.chat_load --port 8765 --sessions 32 --turns 20
+Without --port a server is started in this process with the artifacts built by train.py.
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+CONVERSATION = [
+    "Tell me about fireball",
+    "how much damage does it do",
+    "what's the range",
+    "what wizard spells are 3rd level",
+    "which cleric spells deal radiant damage?",
+    "what saving throw does lightning bolt use",
+    "does it need concentration",
+    "hello there",
+]
+
+
+async def simulate_user(host, port, user, turns, latencies: list[float]) -> int:
+    """Send turns messages of the conversation, starting at a different point per user. Returns the number of errors."""
+    reader, writer = await asyncio.open_connection(host, port)
+    errors = 0
+    try:
+        for turn in range(turns):
+            message = CONVERSATION[(user + turn) % len(CONVERSATION)]
+            start = time.perf_counter()
+            writer.write((json.dumps({"session": f"load-{user}", "message": message}) + "\n").encode('utf-8'))
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            errors += "error" in reply
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return errors
+
+
+async def run_load(host, port, sessions, turns) -> dict:
+    latencies: list[float] = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(simulate_user(host, port, user, turns, latencies) for user in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": sum(errors),
+        "p50_ms": float(np.percentile(latencies, 50)) * 1e3,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1e3,
+        "max_ms": max(latencies) * 1e3,
+        "turns_per_second": len(latencies) / elapsed,
+    }
+
+
+async def run_with_local_server(args) -> dict:
+    # Imported here so loading against a remote server doesn't load any models
+    from chatbot_dnd_spells import Chatbot
+    from chatbot_dnd_spells.chat_server import ChatServer
+
+    chatbot = Chatbot(args.profile)
+    chatbot.load()
+    server = ChatServer(chatbot, port=0, max_workers=args.workers)
+    await server.start()
+    try:
+        # warm up the models so loading them isn't measured
+        await server.chat("warmup", CONVERSATION[0])
+        await server.chat("warmup", CONVERSATION[1])
+        return await run_load(server.host, server.port, args.sessions, args.turns)
+    finally:
+        await server.close()
+        chatbot.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="server to load, starts one in this process if not given")
+    parser.add_argument("--sessions", type=int, default=32, help="concurrent users")
+    parser.add_argument("--turns", type=int, default=20, help="messages per user")
+    parser.add_argument("--workers", type=int, default=4, help="turn threads of the in-process server")
+    parser.add_argument("--profile", default="default", help="serving profile of the in-process server")
+    args = parser.parse_args()
+
+    if args.port is None:
+        results = asyncio.run(run_with_local_server(args))
+    else:
+        results = asyncio.run(run_load(args.host, args.port, args.sessions, args.turns))
+
+    print(f"{results['turns']} turns over {results['sessions']} sessions, {results['errors']} errors")
+    print(f"latency p50 {results['p50_ms']:.1f} ms  p99 {results['p99_ms']:.1f} ms  max {results['max_ms']:.1f} ms")
+    print(f"throughput {results['turns_per_second']:.1f} turns/s")
+
+
+if __name__ == "__main__":
+    main()
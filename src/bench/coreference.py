@@ -0,0 +1,129 @@
+"""
+Benchmark and parity check of CoreferenceResolver
+
+Compares the single scan resolver against the original loop over every label's pronoun regexes, on the
+transcript style messages below and on generated messages combining pronouns, for every combination of
+entity types in the chat context. Exits with status 1 if the resolvers disagree on any of them.
+
+Run from the src directory:
+    python -m bench.coreference
+"""
+import itertools
+import random
+import re
+import sys
+import timeit
+from coreference_resolution import ChatContext, CoreferenceResolver
+from coreference_resolution.coreference_resolver import PRONOUN_PATTERNS
+from entity_recognition import Prediction
+
+MESSAGES = [
+    "Tell me about fireball",
+    "how much damage does it do",
+    "what's its range",
+    "which cleric spells deal that damage type?",
+    "what other spells are in that school",
+    "does that spell need concentration",
+    "and this one?",
+    "list the wizard spells of this level",
+    "What is the saving throw for magic missile?",
+    "hello there",
+]
+
+CONTEXT_VALUES = {"SPELL": "fireball", "SCHOOL": "evocation", "DAMAGE_TYPE": "fire", "CLASS": "wizard", "LEVEL": "3rd level"}
+FILLER = ["what", "does", "spell", "damage", "type", "school", "class", "level", "one", "other", "is", "itself", "thatch", "the"]
+
+# The resolver's pronoun patterns before they were compiled, as regexes
+LEGACY_PATTERNS = {label: [rf"\b{pattern}\b" for pattern in patterns] for label, patterns in PRONOUN_PATTERNS.items()}
+LEGACY_PRIORITY = ["SPELL", "DAMAGE_TYPE", "SCHOOL", "CLASS", "LEVEL"]
+
+
+def legacy_resolve(chat_context, message):
+    """CoreferenceResolver.resolve_coreferences as it was before compiling the patterns, kept for comparison."""
+    def resolve_entity_type(entity_type):
+        context_entity = chat_context.get_context(entity_type)
+        return context_entity.value if context_entity else None
+
+    message_lower = message.lower()
+    resolved_entities = {}
+    for entity_type, patterns in LEGACY_PATTERNS.items():
+        if entity_type == "SPELL":
+            continue
+        for pattern in patterns:
+            if re.search(pattern, message_lower):
+                resolved_value = resolve_entity_type(entity_type)
+                if resolved_value:
+                    resolved_entities[entity_type] = resolved_value
+                    break
+
+    generic_patterns = [r'\bit\b', r'\bits\b', r'\bthat\b', r'\bthis\b']
+    for pattern in LEGACY_PATTERNS["SPELL"]:
+        if re.search(pattern, message_lower):
+            is_generic = any(re.fullmatch(p, pattern) for p in generic_patterns)
+            if not is_generic:
+                resolved_value = resolve_entity_type("SPELL")
+                if resolved_value:
+                    resolved_entities["SPELL"] = resolved_value
+                    break
+            else:
+                # resolved the highest priority type other than SPELL
+                for entity_type in LEGACY_PRIORITY[1:]:
+                    entity_value = resolve_entity_type(entity_type)
+                    if entity_value:
+                        resolved_entities[entity_type] = entity_value
+                        break
+                else:
+                    continue
+                break
+    return resolved_entities
+
+
+def generate_messages(count, seed=0):
+    rng = random.Random(seed)
+    pronouns = list(dict.fromkeys(pronoun for patterns in PRONOUN_PATTERNS.values() for pronoun in patterns))
+    words = pronouns + FILLER
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+
+def contexts():
+    """A chat context for every combination of entity types."""
+    labels = list(CONTEXT_VALUES)
+    for size in range(len(labels) + 1):
+        for combination in itertools.combinations(labels, size):
+            chat_context = ChatContext()
+            for label in combination:
+                chat_context.update_context(Prediction(label, CONTEXT_VALUES[label], 95.0))
+            yield chat_context
+
+
+def main(generated=2000, number=2000, repeat=5):
+    messages = MESSAGES + generate_messages(generated)
+
+    # The resolver must resolve the same entities as the original on every message and context
+    checks = 0
+    mismatches = 0
+    for chat_context in contexts():
+        resolver = CoreferenceResolver(chat_context)
+        for message in messages:
+            checks += 1
+            mismatches += resolver.resolve_coreferences(message) != legacy_resolve(chat_context, message)
+    print(f"{mismatches} mismatches against the original implementation in {checks} checks")
+    if mismatches:
+        sys.exit(1)
+
+    chat_context = next(itertools.islice(contexts(), 31, None))  # every entity type known
+    resolver = CoreferenceResolver(chat_context)
+
+    def timed(resolve):
+        return min(timeit.repeat(lambda: [resolve(message) for message in MESSAGES], repeat=repeat, number=number)) / (number * len(MESSAGES))
+
+    legacy_time = timed(lambda message: legacy_resolve(chat_context, message))
+    resolver_time = timed(resolver.resolve_coreferences)
+    construct_time = min(timeit.repeat(lambda: CoreferenceResolver(chat_context), repeat=repeat, number=number)) / number
+    print(f"original loop:  {legacy_time * 1e6:8.2f} us/message")
+    print(f"single scan:    {resolver_time * 1e6:8.2f} us/message ({legacy_time / resolver_time:.1f}x)")
+    print(f"construction:   {construct_time * 1e6:8.2f} us/resolver")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of SingleFuzzyClassifier with 10k patterns
+
+Pads the real entity data with generated spell-like names up to 10k patterns and compares the original
+nested partial_ratio loop against the indexed classifier, with and without a minimum score and the
+exact match fast path.
+
+Run from the src directory:
+    python -m bench.fuzzy_classifier
+"""
+import json
+import random
+import tempfile
+import timeit
+from pathlib import Path
+from rapidfuzz import fuzz
+from entity_recognition import SingleFuzzyClassifier
+
+ENTITIES_PATH = Path(__file__).parent.parent / 'chatbot_dnd_spells' / 'data_processed' / 'entities.json'
+
+MESSAGES = [
+    "Tell me about fireball",
+    "how much damage does magic missle do",
+    "what wizard spells are 3rd level",
+    "list all evocation cantrips",
+    "which cleric spells deal radiant damage?",
+    "what's the range of lightning bolt",
+    "does it need a dexterity saving throw",
+    "hello there",
+]
+
+SYLLABLES = ["ar", "bel", "cor", "dra", "el", "fen", "gor", "hal", "is", "jor", "kel", "lum", "mor", "nex", "or", "pyr",
+             "quel", "ra", "sil", "tor", "ul", "vor", "wyn", "xan", "yr", "zel"]
+NOUNS = ["bolt", "ward", "blast", "sphere", "shield", "touch", "storm", "step", "wall", "gate", "word", "strike"]
+
+MIN_SCORE = 85
+
+
+def legacy_predict(entities, text):
+    """The classifier's predict as it was before indexing, kept for comparison."""
+    predicted_entities = []
+    for entity in entities:
+        best_score = 0
+        label = entity["label"]
+        value = None
+        for pattern in entity["patterns"]:
+            score = fuzz.partial_ratio(pattern.lower(), text.lower())
+            if score > best_score:
+                best_score = score
+                value = pattern
+            if best_score == 100:
+                break
+        predicted_entities.append((label, value, best_score))
+    return predicted_entities
+
+
+def build_entities(total_patterns, seed=0):
+    with open(ENTITIES_PATH, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    rng = random.Random(seed)
+    spell_entity = next(entity for entity in data["entities"] if entity["label"] == "SPELL")
+    existing = sum(len(entity["patterns"]) for entity in data["entities"])
+    generated = set()
+    while len(generated) < total_patterns - existing:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        generated.add(f"{name}'s {rng.choice(NOUNS)}")
+    spell_entity["patterns"].extend(sorted(generated))
+    return data
+
+
+def main(total_patterns=10_000, repeat=3):
+    data = build_entities(total_patterns)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(data, f)
+        entities_path = f.name
+    try:
+        classifier = SingleFuzzyClassifier(entities_path)
+        pruned_classifier = SingleFuzzyClassifier(entities_path, min_score=MIN_SCORE)
+        exact_classifier = SingleFuzzyClassifier(entities_path, min_score=MIN_SCORE, exact_match=True)
+    finally:
+        Path(entities_path).unlink()
+    entities = data["entities"]
+    print(f"{sum(len(entity['patterns']) for entity in entities)} patterns across {len(entities)} labels")
+
+    # Both classifiers must agree with the original on every prediction the chatbot would use
+    mismatches = 0
+    for message in MESSAGES:
+        legacy = {label: (value, score) for label, value, score in legacy_predict(entities, message)}
+        full = {p.label: (p.value, p.confidence) for p in classifier.predict(message)}
+        pruned = {p.label: (p.value, p.confidence) for p in pruned_classifier.predict(message)}
+        confident = {label: result for label, result in legacy.items() if result[1] >= MIN_SCORE}
+        mismatches += full != legacy
+        mismatches += pruned != confident
+    print(f"{mismatches} mismatches against the original implementation")
+
+    def timed(predict):
+        return min(timeit.repeat(lambda: [predict(message) for message in MESSAGES], repeat=repeat, number=1)) / len(MESSAGES)
+
+    legacy_time = timed(lambda message: legacy_predict(entities, message))
+    full_time = timed(classifier.predict)
+    pruned_time = timed(pruned_classifier.predict)
+    exact_time = timed(exact_classifier.predict)
+    print(f"original loop:        {legacy_time * 1e3:8.2f} ms/message")
+    print(f"batched:              {full_time * 1e3:8.2f} ms/message ({legacy_time / full_time:.1f}x)")
+    print(f"batched + prefilter:  {pruned_time * 1e3:8.2f} ms/message ({legacy_time / pruned_time:.1f}x)")
+    # exact matching can pick a longer pattern than the fuzzy loop on ties, so it's only timed
+    print(f"exact + fuzzy:        {exact_time * 1e3:8.2f} ms/message ({legacy_time / exact_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Micro-benchmark for spell keyword boosting
+
+Compares the original per-row regex implementation against SpellKeywordBooster with precomputed
+sentence features, and checks that both give the same boosts.
+
+Run from the src directory:
+    python -m bench.keyword_boost
+"""
+import json
+import random
+import re
+import timeit
+from pathlib import Path
+from chatbot_dnd_spells.spell_keyword_booster import SpellKeywordBooster
+from embeddings import SentenceChunker
+
+SPELLS_PATH = Path(__file__).parent.parent / 'chatbot_dnd_spells' / 'data_processed' / 'spells.json'
+
+QUERIES = [
+    "how much damage does it do",
+    "how many targets can it hit",
+    "what kind of saving throw is it",
+    "what's the radius",
+    "what is the area of effect",
+    "does it need concentration",
+    "how many creatures can I affect and what's the save",
+    "can I use it on myself",
+]
+
+# Number of candidate rows SpellVectorSearcher boosts per query
+CANDIDATES_PER_QUERY = 25
+
+
+def legacy_keyword_boost(query, sentence):
+    """The keyword boost as it was implemented before the rule table, kept for comparison."""
+    boost_score = 0.0
+    if 'damage' in query.lower() and re.search(r'\b\d+d\d+\b', sentence):
+        boost_score += 0.2
+    if any(word in query.lower() for word in ['how many', 'number']):
+        number_pattern = r'\b(?<!level above\s)(\d+)\b(?!\s+\w+\s+damage\b)'
+        word_number_pattern = r'\b(one|two|three|four|five|six|seven|eight|nine|ten)\b'
+        if re.search(number_pattern, sentence.lower()) or \
+            (re.search(word_number_pattern, sentence.lower()) and not re.search(r'(level|levels)\s+(one|two|three|four|five|six|seven|eight|nine|ten)\b', sentence.lower())):
+            boost_score += 0.2
+    if any(word in query.lower() for word in ['save', 'saving throw']) and 'saving throw' in sentence.lower():
+        boost_score += 0.2
+    if any(word in query.lower() for word in ['aoe', 'area of effect', 'radius', 'area', 'diameter']) and \
+        any(word in sentence.lower() for word in ['radius', 'area of effect', 'sphere', 'cylinder', 'cone', 'cube', 'line', 'diameter']):
+        boost_score += 0.2
+    return boost_score
+
+
+def load_sentences():
+    with open(SPELLS_PATH, 'r', encoding='utf-8') as f:
+        spells = json.load(f)['spells']
+    chunker = SentenceChunker()
+    sentences = []
+    for spell in spells:
+        sentences.extend(chunker.clean_and_split_text(spell['description']))
+    return sentences
+
+
+def main(repeat=5, number=200):
+    booster = SpellKeywordBooster()
+    sentences = load_sentences()
+    # features are computed at embedding time, so this isn't part of the timed work
+    features = {sentence: booster.features(sentence) for sentence in sentences}
+
+    # check the new engine matches the old one on every sentence
+    mismatches = 0
+    for query in QUERIES:
+        query_boosts = booster.query_boosts(query)
+        for sentence in sentences:
+            if abs(legacy_keyword_boost(query, sentence) - booster.boost(query_boosts, features[sentence])) > 1e-9:
+                mismatches += 1
+    print(f"Checked {len(QUERIES) * len(sentences)} query/sentence pairs, {mismatches} mismatches")
+
+    rng = random.Random(0)
+    workload = [(query, rng.sample(sentences, CANDIDATES_PER_QUERY)) for query in QUERIES]
+
+    def run_legacy():
+        for query, candidates in workload:
+            for sentence in candidates:
+                legacy_keyword_boost(query, sentence)
+
+    def run_precompiled():
+        for query, candidates in workload:
+            query_boosts = booster.query_boosts(query)
+            if query_boosts:
+                for sentence in candidates:
+                    booster.boost(query_boosts, features[sentence])
+
+    queries_run = number * len(workload)
+    legacy = min(timeit.repeat(run_legacy, repeat=repeat, number=number)) / queries_run
+    precompiled = min(timeit.repeat(run_precompiled, repeat=repeat, number=number)) / queries_run
+    print(f"legacy:      {legacy * 1e6:8.1f} us/query")
+    print(f"precompiled: {precompiled * 1e6:8.1f} us/query")
+    print(f"speedup:     {legacy / precompiled:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Accuracy delta of the "packed" serving profile's int8 models against the full precision ones
+
+Intent classifier: every intents.json pattern is classified with the full precision and the int8 model,
+for the NumPy and the torch backend.
+Vector search: a golden set of spell questions is searched with the full precision and the int8 query encoder.
+
+Uses the real artifacts built by train.py. Run from the src directory:
+    python -m bench.quantization
+"""
+import json
+import time
+from pathlib import Path
+import numpy as np
+from chatbot_dnd_spells.chatbot_config import ChatbotConfig, SERVING_PROFILES
+from embeddings import VectorSearcher, model_registry
+from intents.assistant import Assistant
+from intents.models import ModelData
+from intents.models.model_data import BACKENDS
+from intents.utils.data_preprocessor import DataPreprocessor
+
+# (spell, question) pairs asked within the spell
+GOLDEN_SET = [
+    ("fireball", "how much damage does it do"),
+    ("fireball", "how big is the area"),
+    ("magic missile", "how many darts does it create"),
+    ("lightning bolt", "what saving throw"),
+    ("cure wounds", "how much does it heal"),
+    ("shield", "what does it do to my armor class"),
+    ("counterspell", "what happens at higher levels"),
+    ("hold person", "can the target repeat the save"),
+    ("misty step", "how far can i teleport"),
+    ("cone of cold", "what happens to creatures killed by it"),
+    ("thunderwave", "does it push creatures"),
+]
+
+TOP_K = 5
+
+
+def intent_accuracy(config: ChatbotConfig):
+    with open(config.intents_path, 'r') as f:
+        intents_data = json.load(f)
+    patterns = [(pattern, intent['tag']) for intent in intents_data['intents'] for pattern in intent['patterns']]
+
+    if not config.model_path.exists():
+        print(f"{config.model_path} doesn't exist, run train.py first.")
+        return
+
+    for backend in BACKENDS:
+        results = {}
+        for quantize in (False, True):
+            model_data = ModelData.load_model(config.model_path, backend, quantize)
+            # predict_probabilities handles both backends, without the response side effects
+            assistant = Assistant(model_data, config.exceptions_path)
+            bags = DataPreprocessor.bags_of_words(
+                [DataPreprocessor.tokenize_and_lemmatize(pattern) for pattern, _ in patterns], model_data.vocabulary_index
+            )
+            start = time.perf_counter()
+            for bag in bags:
+                assistant.predict_probabilities(bag[np.newaxis])
+            per_message = (time.perf_counter() - start) / len(bags)
+            probabilities = assistant.predict_probabilities(bags)
+            predicted = [model_data.intents[i] for i in probabilities.argmax(axis=1)]
+            accuracy = sum(prediction == tag for prediction, (_, tag) in zip(predicted, patterns)) / len(patterns)
+            results[quantize] = (probabilities, predicted, accuracy, per_message)
+
+        full, quantized = results[False], results[True]
+        agreement = sum(a == b for a, b in zip(full[1], quantized[1])) / len(patterns)
+        print(f"intent classifier ({backend}), {len(patterns)} patterns:")
+        print(f"  accuracy   float32 {full[2]:.2%}  int8 {quantized[2]:.2%}  delta {quantized[2] - full[2]:+.2%}")
+        print(f"  agreement  {agreement:.2%}, max probability difference {np.abs(full[0] - quantized[0]).max():.4f}")
+        print(f"  latency    float32 {full[3] * 1e6:.1f} us  int8 {quantized[3] * 1e6:.1f} us per message")
+
+
+def vector_search_accuracy(config: ChatbotConfig):
+    if not config.spells_db_path.exists():
+        print(f"{config.spells_db_path} doesn't exist, run train.py first.")
+        return
+
+    queries = [query for _, query in GOLDEN_SET]
+    rankings = {}
+    for quantize in (False, True):
+        searcher = VectorSearcher(config.spells_db_path, quantize=quantize)
+        embeddings = np.stack(searcher.model.encode(queries))
+        start = time.perf_counter()
+        for query in queries:
+            searcher.model.encode(query)
+        per_query = (time.perf_counter() - start) / len(queries)
+        results = [
+            [result.chunk_text for result in searcher.search(query, spell, TOP_K, query_embedding=embedding)]
+            for (spell, query), embedding in zip(GOLDEN_SET, embeddings)
+        ]
+        rankings[quantize] = (embeddings, results, per_query)
+        searcher.close()
+
+    (full_embeddings, full_results, full_time), (int8_embeddings, int8_results, int8_time) = rankings[False], rankings[True]
+    cosine = np.sum(full_embeddings * int8_embeddings, axis=1) / (
+        np.linalg.norm(full_embeddings, axis=1) * np.linalg.norm(int8_embeddings, axis=1)
+    )
+    top_1 = sum(a[:1] == b[:1] for a, b in zip(full_results, int8_results)) / len(GOLDEN_SET)
+    overlap = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(full_results, int8_results)])
+    print(f"query encoder ({model_registry.DEFAULT_MODEL_NAME}), {len(GOLDEN_SET)} golden questions:")
+    print(f"  top-1 agreement {top_1:.2%}, overlap@{TOP_K} {overlap:.2%}")
+    print(f"  query embedding cosine min {cosine.min():.4f} mean {cosine.mean():.4f}")
+    print(f"  latency float32 {full_time * 1e3:.1f} ms  int8 {int8_time * 1e3:.1f} ms per query")
+    print(f"  load    float32 {model_registry.get_load_time():.2f}s  int8 {model_registry.get_load_time(quantize=True):.2f}s")
+
+
+def main():
+    config = ChatbotConfig(Path(__file__).parent.parent / 'chatbot_dnd_spells', "packed")
+    model_registry.set_num_threads(SERVING_PROFILES["packed"].num_threads)
+    intent_accuracy(config)
+    vector_search_accuracy(config)
+
+
+if __name__ == "__main__":
+    main()
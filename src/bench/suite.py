@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark and answer regression suite
+
+Replays the golden transcripts in bench/transcripts through Chatbot.handle_turn and measures:
+    cold start: seconds and peak memory to load and answer a first message, for Chatbot, Assistant,
+        SpellEntityClassifier and SpellVectorSearcher separately, each in a fresh process
+    latency: per turn latency of each component on the transcript messages, and per stage of handle_turn
+    answers: every response compared with the golden answers in bench/golden
+
+Random response choices are seeded per conversation so the answers are reproducible. The results are JSON
+meant to be diffed between commits. The suite exits with status 1 if any answer changed. Transcripts without
+golden answers are reported as not recorded and aren't checked, record them with --update-golden.
+
+Uses the real artifacts built by train.py. Run from the src directory:
+    python -m bench.suite --output bench_results.json
+    python -m bench.suite --update-golden     # after an intended change to the answers
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+BENCH_DIR = Path(__file__).parent
+TRANSCRIPTS_DIR = BENCH_DIR / 'transcripts'
+GOLDEN_DIR = BENCH_DIR / 'golden'
+SRC_DIR = BENCH_DIR.parent
+
+SEED = 1234
+COMPONENTS = ("Chatbot", "Assistant", "SpellEntityClassifier", "SpellVectorSearcher")
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return None
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def cold_start(component: str) -> dict:
+    """Load one component and answer a first message, meant to run in a fresh process."""
+    start = time.perf_counter()
+    # Imports are part of the cold start
+    from chatbot_dnd_spells.chatbot_config import ChatbotConfig
+    config = ChatbotConfig(SRC_DIR / 'chatbot_dnd_spells')
+    message = "Tell me about fireball"
+
+    if component == "Chatbot":
+        from chatbot_dnd_spells import Chatbot
+        chatbot = Chatbot()
+        chatbot.load()
+        chatbot.vector_searcher.cache_path = None
+        chatbot.handle_turn(chatbot.session, message)
+    elif component == "Assistant":
+        from intents.assistant import Assistant
+        from intents.models import ModelData
+        Assistant(ModelData.load_model(config.model_path), config.exceptions_path).process_message(message)
+    elif component == "SpellEntityClassifier":
+        from chatbot_dnd_spells.spell_entity_classifier import SpellEntityClassifier
+        SpellEntityClassifier(config.processed_entity_label_data_path, min_score=85).predict(message)
+    elif component == "SpellVectorSearcher":
+        from chatbot_dnd_spells.spell__vector_searcher import SpellVectorSearcher
+        searcher = SpellVectorSearcher(config.spells_db_path, index_dir=config.vector_index_dir)
+        searcher.search("how much damage does it do", "fireball")
+        searcher.close()
+    else:
+        raise ValueError(f"Unknown component {component}, expected one of {COMPONENTS}.")
+
+    return {"seconds": time.perf_counter() - start, "peak_rss_mb": _peak_rss_mb()}
+
+
+def measure_cold_starts() -> dict:
+    results = {}
+    for component in COMPONENTS:
+        process = subprocess.run(
+            [sys.executable, "-m", "bench.suite", "--cold-start", component],
+            cwd=SRC_DIR, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            results[component] = {"error": process.stderr.strip().splitlines()[-1:]}
+            continue
+        # the component may print while loading, the result is the last line
+        results[component] = json.loads(process.stdout.strip().splitlines()[-1])
+    return results
+
+
+def _latency_stats(seconds: list[float]) -> dict:
+    times = np.array(seconds) * 1e3
+    return {
+        "mean_ms": float(times.mean()),
+        "p50_ms": float(np.percentile(times, 50)),
+        "p99_ms": float(np.percentile(times, 99)),
+    }
+
+
+def measure_component_latency(chatbot, messages: list[str]) -> dict:
+    """
+    Per message latency of each component called on its own, caches are cleared first.
+
+    SpellVectorSearcher is timed with search, as handle_turn calls it for questions about a spell, using the spell
+    named in the message or the last one named before it. search_spells, used for find_spells, is timed separately.
+    """
+    chatbot.vector_searcher.query_cache.clear()
+    chatbot.vector_searcher.response_cache.clear()
+    timings = {"Assistant": [], "SpellEntityClassifier": [], "SpellVectorSearcher": [], "SpellVectorSearcher.search_spells": []}
+    spell_name = "fireball"
+    for message in messages:
+        start = time.perf_counter()
+        chatbot.assistant.process_message(message)
+        timings["Assistant"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        predictions = chatbot.entity_classifier.predict(message)
+        timings["SpellEntityClassifier"].append(time.perf_counter() - start)
+        for prediction in predictions:
+            if prediction.label == "SPELL" and prediction.confidence >= 85:
+                spell_name = prediction.value
+
+        start = time.perf_counter()
+        chatbot.vector_searcher.search(message, spell_name, rec_score=0.45, min_score=0.5, max_results=3)
+        timings["SpellVectorSearcher"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        chatbot.vector_searcher.search_spells(message, min_score=0.5, max_spells=3)
+        timings["SpellVectorSearcher.search_spells"].append(time.perf_counter() - start)
+    return {component: _latency_stats(seconds) for component, seconds in timings.items()}
+
+
+def replay_transcripts(chatbot) -> dict:
+    """Replay every transcript with seeded response choices, returns transcript name -> conversations of TurnResults."""
+    from chatbot_dnd_spells import transcript_replay
+    results = {}
+    for path in sorted(TRANSCRIPTS_DIR.glob('*.txt')):
+        conversations = []
+        for conversation in transcript_replay.read_transcript(path):
+            random.seed(SEED)
+            conversations.extend(transcript_replay.replay(chatbot, [conversation]))
+        results[path.stem] = conversations
+    return results
+
+
+def compare_answers(replayed: dict, update_golden: bool) -> dict:
+    """Compare the replayed answers with the golden ones, or record them when updating."""
+    changed = []
+    not_recorded = []
+    recorded = []
+    turns = 0
+    for name, conversations in replayed.items():
+        answers = [
+            [{"message": turn.message, "intent": turn.intent, "response": turn.response} for turn in conversation]
+            for conversation in conversations
+        ]
+        turns += sum(len(conversation) for conversation in answers)
+        golden_path = GOLDEN_DIR / f"{name}.json"
+        if update_golden:
+            GOLDEN_DIR.mkdir(exist_ok=True)
+            with open(golden_path, 'w', encoding='utf-8') as f:
+                json.dump(answers, f, indent=2)
+            recorded.append(name)
+            continue
+        if not golden_path.exists():
+            not_recorded.append(name)
+            continue
+
+        with open(golden_path, 'r', encoding='utf-8') as f:
+            golden = json.load(f)
+        golden_turns = [turn for conversation in golden for turn in conversation]
+        answer_turns = [turn for conversation in answers for turn in conversation]
+        if len(golden_turns) != len(answer_turns):
+            changed.append({"transcript": name, "error": "the transcript no longer matches its golden answers, update them"})
+            continue
+        for expected, actual in zip(golden_turns, answer_turns):
+            if expected != actual:
+                changed.append({"transcript": name, "expected": expected, "actual": actual})
+
+    return {"turns": turns, "changed": changed, "not_recorded": not_recorded, "recorded": recorded}
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(update_golden=False, skip_cold_start=False) -> dict:
+    from chatbot_dnd_spells import Chatbot
+    from chatbot_dnd_spells import transcript_replay
+    from intents.exception_log import ExceptionLog
+
+    results = {"commit": _commit()}
+    if not skip_cold_start:
+        results["cold_start"] = measure_cold_starts()
+
+    chatbot = Chatbot()
+    chatbot.load()
+    # Don't touch the real exceptions log or the saved query cache
+    exceptions_dir = tempfile.TemporaryDirectory()
+    chatbot.assistant.exception_log = ExceptionLog(Path(exceptions_dir.name) / 'exceptions.jsonl')
+    chatbot.vector_searcher.cache_path = None
+    # Start from cold caches, but with the embedding model loaded so it isn't charged to the first search
+    chatbot.vector_searcher.query_cache.clear()
+    chatbot.vector_searcher.load_model()
+
+    replayed = replay_transcripts(chatbot)
+    turns = [turn for conversations in replayed.values() for conversation in conversations for turn in conversation]
+    results["latency"] = measure_component_latency(chatbot, [turn.message for turn in turns])
+    results["latency"]["Chatbot"] = _latency_stats([turn.total_time for turn in turns])
+    results["stages"] = transcript_replay.stage_breakdown(turns)
+    results["answers"] = compare_answers(replayed, update_golden)
+
+    chatbot.close()
+    exceptions_dir.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark and answer regression suite")
+    parser.add_argument("--output", metavar="JSON", help="write the results to a file as well as printing them")
+    parser.add_argument("--update-golden", action="store_true", help="record the current answers as the golden answers")
+    parser.add_argument("--skip-cold-start", action="store_true", help="don't start a process per component")
+    parser.add_argument("--cold-start", choices=COMPONENTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start:
+        print(json.dumps(cold_start(args.cold_start)))
+        return
+
+    results = run_suite(args.update_golden, args.skip_cold_start)
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+
+    answers = results["answers"]
+    if answers["recorded"]:
+        print(f"Recorded golden answers for {', '.join(answers['recorded'])}")
+    if answers["not_recorded"]:
+        print(f"Golden answers not recorded for {', '.join(answers['not_recorded'])}, their answers weren't checked. "
+              f"Record them with --update-golden")
+    if answers["changed"]:
+        print(f"{len(answers['changed'])}/{answers['turns']} answers changed from the golden answers")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark of per-spell vector search: sqlite-vec against the NumpyVectorIndex
+
+Uses the real spells.db built by train.py. The index is exported to a temporary directory so the
+artifacts aren't touched. Query embeddings are created once up front so only the search is timed.
+
+Run from the src directory:
+    python -m bench.vector_backends
+"""
+import random
+import tempfile
+import timeit
+from pathlib import Path
+from chatbot_dnd_spells.chatbot_config import ChatbotConfig
+from embeddings import model_registry
+from embeddings.db_queries import get_embeddings_for_entry
+from embeddings.db_setup import connect
+from embeddings.numpy_index import NumpyVectorIndex
+
+QUERIES = [
+    "how much damage does it do",
+    "what's the range",
+    "how many targets",
+    "what saving throw",
+    "what happens at higher levels",
+    "how big is the area",
+    "does it need concentration",
+    "can it affect undead",
+]
+
+TOP_K = 25
+
+
+def main(samples=200, repeat=5):
+    config = ChatbotConfig(Path(__file__).parent.parent / 'chatbot_dnd_spells')
+    if not config.spells_db_path.exists():
+        print(f"{config.spells_db_path} doesn't exist, run train.py first.")
+        return
+
+    conn = connect(config.spells_db_path)
+    entry_names = [name for (name,) in conn.execute('SELECT name FROM entries')]
+
+    model = model_registry.get_model()
+    query_embeddings = model.encode(QUERIES)
+    rng = random.Random(0)
+    workload = [(query_embeddings[rng.randrange(len(QUERIES))], rng.choice(entry_names)) for _ in range(samples)]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        NumpyVectorIndex.export(conn, index_dir)
+        index = NumpyVectorIndex.load(index_dir)
+        print(f"{len(index)} embeddings across {len(entry_names)} entries, top_k={TOP_K}")
+
+        # Both backends should return the same chunks in the same order
+        mismatches = 0
+        for query_embedding, entry_name in workload:
+            sqlite_chunks = [row[1] for row in get_embeddings_for_entry(conn, query_embedding, entry_name, TOP_K)]
+            numpy_chunks = [result.chunk_text for result in index.search(query_embedding, entry_name, TOP_K)]
+            mismatches += sqlite_chunks != numpy_chunks
+        print(f"{mismatches}/{samples} searches returned a different ranking (ties can reorder)")
+
+        def run_sqlite():
+            for query_embedding, entry_name in workload:
+                get_embeddings_for_entry(conn, query_embedding, entry_name, TOP_K)
+
+        def run_numpy():
+            for query_embedding, entry_name in workload:
+                index.search(query_embedding, entry_name, TOP_K)
+
+        sqlite_time = min(timeit.repeat(run_sqlite, repeat=repeat, number=1)) / samples
+        numpy_time = min(timeit.repeat(run_numpy, repeat=repeat, number=1)) / samples
+
+    conn.close()
+    print(f"sqlite-vec: {sqlite_time * 1e6:8.1f} us/search")
+    print(f"numpy:      {numpy_time * 1e6:8.1f} us/search")
+    print(f"speedup:    {sqlite_time / numpy_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.ttl_cache import TTLCache
+from .chat_session import ChatSession
+
+class ChatServer:
+    """
+    Line protocol chat server answering many sessions with the models of one loaded Chatbot.
+
+    Each line a client sends is a JSON object {"session": id, "message": text}, answered with a JSON line
+    {"session": id, "response": text, "intent": intent, "latency": seconds, "timings": {stage: seconds}}
+    or {"error": text}. latency includes waiting for a thread, timings are the stages of Chatbot.handle_turn.
+    Lines that aren't a JSON object are messages of a session tied to the connection, so the server
+    can be tried out with netcat.
+
+    Turns run on a bounded thread pool so the event loop keeps serving other connections while the models work.
+    Turns of one session run one at a time in the order they arrive. Sessions idle for session_ttl seconds are evicted.
+    """
+
+    def __init__(self, chatbot, host="127.0.0.1", port=8765, max_workers=4, session_ttl=1800.0, max_sessions=10000):
+        """
+        Args:
+            chatbot: A loaded Chatbot
+            port: Port to listen on, 0 picks a free one which is stored in port once started
+            max_workers: Threads answering turns, the intent classifier, entity recognition and search run on them
+            session_ttl: Seconds without a turn before a session's context and history are dropped
+            max_sessions: Sessions kept at most, the least recently active are evicted first
+        """
+        self.chatbot = chatbot
+        self.host = host
+        self.port = port
+        self.session_ttl = session_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-turn")
+        # session id -> (ChatSession, lock ordering its turns), stored again after every turn to renew its expiry
+        self.sessions = TTLCache(max_sessions, session_ttl)
+        self.turns = 0
+        self._connection_ids = itertools.count(1)
+        self._server: asyncio.Server | None = None
+        self._evictor: asyncio.Task | None = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._evictor = asyncio.create_task(self._evict_idle_sessions())
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        print(f"Serving chat sessions on {self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._evictor is not None:
+            self._evictor.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    def _session(self, session_id: str) -> tuple[ChatSession, asyncio.Lock]:
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            entry = (ChatSession(session_id), asyncio.Lock())
+        self.sessions.put(session_id, entry)
+        return entry
+
+    async def chat(self, session_id: str, message: str) -> dict:
+        """Answer a message of a session on the thread pool."""
+        session, lock = self._session(session_id)
+        start = time.perf_counter()
+        async with lock:
+            turn = await asyncio.get_running_loop().run_in_executor(self.executor, self.chatbot.handle_turn, session, message)
+        self.sessions.put(session_id, (session, lock))
+        self.turns += 1
+        return {
+            "session": session_id,
+            "response": turn.response,
+            "intent": turn.intent,
+            "latency": time.perf_counter() - start,
+            "timings": turn.timings
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection_session_id = f"connection-{next(self._connection_ids)}"
+        try:
+            while line := await reader.readline():
+                try:
+                    line = line.decode('utf-8').strip()
+                except UnicodeDecodeError:
+                    # Answered like any other bad request rather than dropping the connection
+                    writer.write((json.dumps({"error": "Expected a UTF-8 encoded line."}) + "\n").encode('utf-8'))
+                    await writer.drain()
+                    continue
+                if not line:
+                    continue
+
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = None
+                if not isinstance(request, dict):
+                    request = {"session": connection_session_id, "message": line}
+
+                message = request.get("message")
+                if not isinstance(message, str):
+                    reply = {"error": 'Expected {"session": id, "message": text}.'}
+                else:
+                    try:
+                        reply = await self.chat(str(request.get("session", connection_session_id)), message)
+                    except Exception as e:
+                        reply = {"error": f"Error occurred: {e}"}
+
+                writer.write((json.dumps(reply) + "\n").encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.session_ttl / 4))
+            self.sessions.evict_expired()
@@ -0,0 +1,10 @@
+from coreference_resolution import ChatContext
+from coreference_resolution.coreference_resolver import CoreferenceResolver
+
+class ChatSession:
+    """Conversation state of one user. The models loaded by a Chatbot are shared by all of its sessions."""
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.chat_context = ChatContext()
+        self.coreference_resolver = CoreferenceResolver(self.chat_context)
@@ -1,4 +1,4 @@
-import json
+import time
 from pathlib import Path
 from .spell_entity_classifier import SpellEntityClassifier
 from intents.assistant import Assistant
@@ -6,32 +6,43 @@ from intents.models import ModelData
 from intents.interfaces import ChatbotInterface
 from chatbot_dnd_spells.chatbot_config import ChatbotConfig
 from .spell__vector_searcher import SpellVectorSearcher
+from .spell_repository import SpellRepository
+from embeddings import model_registry
+from .chat_session import ChatSession
+from .data_classes import TurnResult, TURN_STAGES
 from coreference_resolution import ChatContext
-from coreference_resolution.coreference_resolver import CoreferenceResolver
 from entity_recognition import Prediction
 from utils.colors import YELLOW, RESET
+from utils.nltk_data import download_nltk_data
 import re
 
 class Chatbot(ChatbotInterface):
     
-    def __init__(self):
+    def __init__(self, serving_profile="default"):
         # Get paths relative to this file's location
         current_dir = Path(__file__).parent
-        self.config = ChatbotConfig(current_dir)
+        self.config = ChatbotConfig(current_dir, serving_profile)
         self.function_mappings = {}
-        self.entity_classifier = SpellEntityClassifier(self.config.processed_entity_label_data_path)
-        self.chat_context = ChatContext()
-        self.coreference_resolver = CoreferenceResolver(self.chat_context)
+        # Entities below 85 confidence are ignored, so the classifier can skip patterns that can't reach it
+        self.entity_classifier = SpellEntityClassifier(
+            self.config.processed_entity_label_data_path,
+            min_score=85,
+            workers=self.config.serving_profile.num_threads or -1
+        )
+        # the conversation of the command line chat, servers create a ChatSession per user
+        self.session = ChatSession()
+        self.chat_context = self.session.chat_context
+        self.coreference_resolver = self.session.coreference_resolver
         self.debug = False
 
-    def substitute_spell_data(self, response: str) -> str:
+    def substitute_spell_data(self, response: str, chat_context: ChatContext) -> str:
         """Substitute entity placeholders found in the response with values from spell data"""
         # Find all placeholders in the response {key}
         placeholders = re.findall(r'\{(\w+)\}', response)
         
-        spell_name = self.chat_context.get_context("SPELL")
+        spell_name = chat_context.get_context("SPELL")
 
-        spell_data = self.chat_context.fetch_data(self.config.processed_spell_data_path, "name", spell_name.value)
+        spell_data = self.spell_repository.get(spell_name.value)
 
         for key in placeholders:
             if key in spell_data:
@@ -66,39 +77,149 @@ class Chatbot(ChatbotInterface):
         pass
     
     def load(self):
-        intent_classifier = ModelData.load_model(self.config.model_path, self.config.model_data_path)
+        start = time.perf_counter()
+        # Deployments can ship trained artifacts without ever running train.py, so fail here rather than on the first turn
+        download_nltk_data()
+        serving_profile = self.config.serving_profile
+        model_registry.set_num_threads(serving_profile.num_threads)
+        intent_classifier = ModelData.load_model(self.config.model_path, quantize=serving_profile.quantize)
 
         self.assistant = Assistant(
             intent_classifier,
             self.config.exceptions_path
         )
 
-        self.vector_searcher = SpellVectorSearcher(self.config.spells_db_path)
+        self.spell_repository = SpellRepository.load(self.config.processed_spell_data_path)
+
+        self.vector_searcher = SpellVectorSearcher(
+            self.config.spells_db_path,
+            self.config.query_cache_path,
+            spell_repository=self.spell_repository,
+            index_dir=self.config.vector_index_dir,
+            quantize=serving_profile.quantize
+        )
 
-    def fetch_spell_list(self):
+        # The embedding model isn't loaded here, it's loaded in the background once the chat starts
+        self.load_time = time.perf_counter() - start
+
+    def fetch_spell_list(self, chat_context: ChatContext):
         """Fetch a list of spells based on current context (e.g., class, level, damage_type, and school)"""
-        # Now use the criteria to fetch the spell list
-        with open(self.config.processed_spell_data_path, 'r', encoding='utf-8') as f:
-            filtered_spells = json.load(f).get('spells', [])
+        def context_value(label):
+            context = chat_context.get_context(label)
+            return context.value if context else None
+
+        # Intersect the prebuilt indexes, results come back sorted by level and then alphabetically
+        return self.spell_repository.filter(
+            spell_class=context_value("CLASS"),
+            level=context_value("LEVEL"),
+            school=context_value("SCHOOL"),
+            damage_type=context_value("DAMAGE_TYPE")
+        )
 
-        if self.chat_context.get_context("CLASS"):
-            filtered_spells = [spell for spell in filtered_spells if self.chat_context.get_context("CLASS").value in spell.get("classes", [])]
-        if self.chat_context.get_context("LEVEL"):
-            filtered_spells = [spell for spell in filtered_spells if self.chat_context.get_context("LEVEL").value == spell.get("level")]
-        if self.chat_context.get_context("DAMAGE_TYPE"):
-            filtered_spells = [spell for spell in filtered_spells if self.chat_context.get_context("DAMAGE_TYPE").value in spell.get("damageTypes", [])]
-        if self.chat_context.get_context("SCHOOL"):
-            filtered_spells = [spell for spell in filtered_spells if self.chat_context.get_context("SCHOOL").value == spell.get("school")]
+    def handle_turn(self, session: ChatSession, message: str) -> TurnResult:
+        """
+        Answer one message of a session and add the turn to its chat history.
+
+        Only reads the shared models, so different sessions can be answered from different threads.
+        The result has the time spent in each stage of the turn, see TURN_STAGES.
+        """
+        chat_context = session.chat_context
+        timings = dict.fromkeys(TURN_STAGES, 0.0)
+        stage_start = time.perf_counter()
+
+        def end_stage(stage):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings[stage] += now - stage_start
+            stage_start = now
+
+        # First, resolve any coreferences in the message
+        resolved_entities = session.coreference_resolver.resolve_coreferences(message)
+
+        # Update chat context with resolved entities
+        for entity_type, entity_value in resolved_entities.items():
+            # Create a prediction object for the resolved entity
+            resolved_prediction = Prediction(entity_type, entity_value, 95.0)  # High confidence for resolved entities
+            chat_context.update_context(resolved_prediction)
+        end_stage("resolve")
+
+        # The predicted tag is kept even below the confidence threshold for the exceptions log
+        predicted_tag, confidence = self.assistant.classify(message)
+        predicted_intent, response, confidence = self.assistant.respond(predicted_tag, confidence)
+        end_stage("intent")
+
+        # Extract spell entities if this intent requires entity recognition (only if no coreferences were resolved)
+        if not resolved_entities:
+            chat_context.clear_contexts()
+            predictions = self.entity_classifier.predict(message)
+            for prediction in predictions:
+                if prediction.confidence >= 85:
+                    if self.debug:
+                        print(f"{YELLOW}Entity: {prediction.label}, Value: {prediction.value}, Confidence: {prediction.confidence}{RESET}")
+                    chat_context.update_context(prediction)
+        end_stage("ner")
+
+        # Determine if we're querying for a spell list
+        if predicted_intent == "query_spells":
+            #TODO This still needs work to handle multiple criteria
+            filtered_spells = self.fetch_spell_list(chat_context)
+            end_stage("fetch")
+            if not filtered_spells:
+                response = "I couldn't find any spells matching your criteria."
+            else:
+                last_level = None
+                for spell in filtered_spells:
+                    if spell["level"] != last_level:
+                        level_name = "Cantrips" if spell["level"] == 0 else f"Level {spell['level']}"
+                        response += f"\n{level_name}:\n"
+                        last_level = spell["level"]
+                    response += f"- {spell['name']}\n"
+                response = response.strip()  # Remove trailing newline
+        elif predicted_intent == "find_spells":
+            # Look for spells whose description matches the question e.g. "which spells let me teleport?"
+            response = self.vector_searcher.search_spells(message, min_score=0.5, max_spells=3)
+            end_stage("vector_search")
+            if not response:
+                response = "I couldn't find any spells like that."
+                self._write_exception(message, predicted_tag, confidence, chat_context, timings)
+        else:
+            spell = chat_context.get_context("SPELL")
+            if spell is None or spell.confidence < 85:
+                if not predicted_intent:
+                    response = "I'm not sure what you mean. Could you please rephrase?"
+                    self._write_exception(message, predicted_tag, confidence, chat_context, timings)
+                else:
+                    response = "I'm sorry, I can't find that spell in my grimoire. Could you try again?"
+            else:
+                if not predicted_intent:
+                    response = self.vector_searcher.search(message, spell.value, rec_score=0.45, min_score=0.5, max_results=3)
+                    end_stage("vector_search")
+                    if not response:
+                        response = "I'm not sure what you mean. Could you please rephrase?"
+                        self._write_exception(message, predicted_tag, confidence, chat_context, timings)
+                else:
+                    response = self.substitute_spell_data(response, chat_context)
 
-        # sort by level and then alphabetically
-        filtered_spells.sort(key=lambda x: (x.get("level", 0), x.get("name", "")))
+        # Add conversation to chat history
+        chat_context.add_to_chat_history(message, response)
+        end_stage("format")
+        return TurnResult(message, response, predicted_intent, confidence, timings)
 
-        return filtered_spells
+    def _write_exception(self, message, predicted_tag, confidence, chat_context: ChatContext, timings: dict[str, float]):
+        entities = {label: prediction.value for label, prediction in chat_context.context.items()}
+        self.assistant.write_exception(message, predicted_tag, confidence, entities, sum(timings.values()))
+
+    def close(self):
+        self.assistant.close()
+        self.vector_searcher.close()
 
     def run(self):
         print("Welcome to the DnD Spell Chatbot!")
         print("Type '/debug' to enter debug mode or '/quit' to exit.")
 
+        # Warm up the vector search model while the user types their first message
+        self.vector_searcher.preload()
+
         while True:
             message = input('You:')
 
@@ -107,70 +228,19 @@ class Chatbot(ChatbotInterface):
                 self.assistant.debug = True
                 self.vector_searcher.debug = True
                 print("Debug mode enabled.")
+                print(f"{YELLOW}Query cache: {self.vector_searcher.query_cache.stats()}{RESET}")
+                print(f"{YELLOW}Response cache: {self.vector_searcher.response_cache.stats()}{RESET}")
                 continue
 
             if message == "/quit":
+                self.close()
                 exit()
 
-            # First, resolve any coreferences in the message
-            resolved_entities = self.coreference_resolver.resolve_coreferences(message)
-            
-            # Update chat context with resolved entities
-            for entity_type, entity_value in resolved_entities.items():
-                # Create a prediction object for the resolved entity
-                resolved_prediction = Prediction(entity_type, entity_value, 95.0)  # High confidence for resolved entities
-                self.chat_context.update_context(resolved_prediction)
-
-            predicted_intent, response, confidence = self.assistant.process_message(message)
-
-            # Extract spell entities if this intent requires entity recognition (only if no coreferences were resolved)
-            if not resolved_entities:
-                self.chat_context.clear_contexts()
-                predictions = self.entity_classifier.predict(message)
-                for prediction in predictions:
-                    if prediction.confidence >= 85:
-                        if self.debug:
-                            print(f"{YELLOW}Entity: {prediction.label}, Value: {prediction.value}, Confidence: {prediction.confidence}{RESET}")
-                        self.chat_context.update_context(prediction)
-
-            # Determine if we're querying for a spell list
-            if predicted_intent == "query_spells":
-                #TODO This still needs work to handle multiple criteria
-                filtered_spells = self.fetch_spell_list()
-                if not filtered_spells:
-                    response = "I couldn't find any spells matching your criteria."
-                else:
-                    last_level = None
-                    for spell in filtered_spells:
-                        if spell["level"] != last_level:
-                            level_name = "Cantrips" if spell["level"] == 0 else f"Level {spell['level']}"
-                            response += f"\n{level_name}:\n"
-                            last_level = spell["level"]
-                        response += f"- {spell['name']}\n"
-                    response = response.strip()  # Remove trailing newline
-            else:
-                spell = self.chat_context.get_context("SPELL")
-                if spell is None or spell.confidence < 85:
-                    if not predicted_intent:
-                        response = "I'm not sure what you mean. Could you please rephrase?"
-                        self.assistant.write_exception(message, predicted_intent, confidence)
-                    else:
-                        response = "I'm sorry, I can't find that spell in my grimoire. Could you try again?"
-                else:
-                    if not predicted_intent:
-                        response = self.vector_searcher.search(message, spell.value, rec_score=0.45, min_score=0.5, max_results=3)
-                        if not response:
-                            response = "I'm not sure what you mean. Could you please rephrase?"
-                            self.assistant.write_exception(message, predicted_intent, confidence)
-                    else:
-                        response = self.substitute_spell_data(response)
-
-            print(response)
+            turn = self.handle_turn(self.session, message)
+
+            print(turn.response)
             print() # add a blank line for readability
             
-            # Add conversation to chat history
-            self.chat_context.add_to_chat_history(message, response)
-            
             # Handle function mappings
-            if predicted_intent in self.function_mappings:
-                self.function_mappings[predicted_intent]()
\ No newline at end of file
+            if turn.intent in self.function_mappings:
+                self.function_mappings[turn.intent]()
\ No newline at end of file
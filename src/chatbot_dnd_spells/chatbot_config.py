@@ -1,13 +1,33 @@
+from dataclasses import dataclass
 from pathlib import Path
 
+@dataclass(frozen=True)
+class ServingProfile:
+    # int8 dynamic quantization of the intent classifier and the query encoder
+    quantize: bool = False
+    # torch intra-op and fuzzy matching threads per process, None uses every core
+    num_threads: int | None = None
+
+SERVING_PROFILES = {
+    "default": ServingProfile(),
+    # many chat workers per node: smaller models and one core each
+    "packed": ServingProfile(quantize=True, num_threads=1),
+}
+
 class ChatbotConfig():
     
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, serving_profile="default"):
         # Get paths relative to this file's location
+
+        # how the models are run when chatting, see SERVING_PROFILES
+        self.serving_profile = SERVING_PROFILES[serving_profile]
         
         # intents
         self.intents_path = base_dir / 'intents' / 'intents.json'
-        self.exceptions_path = base_dir / 'intents' / 'exceptions.txt'
+        self.exceptions_path = base_dir / 'intents' / 'exceptions.jsonl'
+        # plain text log written by earlier versions, still read when suggesting patterns
+        self.legacy_exceptions_path = base_dir / 'intents' / 'exceptions.txt'
+        self.candidate_patterns_path = base_dir / 'intents' / 'candidate_patterns.json'
         
         # raw data paths
         raw_data_dir = base_dir / 'data_raw'
@@ -23,6 +43,8 @@ class ChatbotConfig():
         self.artifacts_dir = base_dir / 'artifacts'
         self.entity_classifier_model_path = self.artifacts_dir / 'entity_classifier_model'
         self.spells_db_path = self.artifacts_dir / 'spells.db'
-        self.model_data_path = self.artifacts_dir / 'model_data.json'
-        self.model_path = self.artifacts_dir / 'intent_model'
+        self.query_cache_path = self.artifacts_dir / 'query_cache.npz'
+        self.vector_index_dir = self.artifacts_dir / 'vector_index'
+        # intent classifier weights, vocabulary and intents in one file, see intents.models.model_artifact
+        self.model_path = self.artifacts_dir / 'intent_model.bin'
 
@@ -2,10 +2,12 @@ import json
 from pathlib import Path
 from chatbot_dnd_spells.chatbot_config import ChatbotConfig
 from embeddings import Embedder, SentenceChunker
+from embeddings.db_setup import connect
+from embeddings.numpy_index import NumpyVectorIndex
 from embeddings.data_classes import RawEntry
-from intents import Trainer
 from intents.interfaces import ChatbotTrainerInterface
 from .spell_entity_classifier import SpellEntityClassifier
+from .spell_keyword_booster import SpellKeywordBooster
 
 class ChatbotTrainer(ChatbotTrainerInterface):
     
@@ -28,10 +30,48 @@ class ChatbotTrainer(ChatbotTrainerInterface):
 
     def train_intents(self):
         print ("Starting intent training process...")
+        from intents import Trainer
         trainer = Trainer(self.config.intents_path)
-        trainer.train_and_save(self.config.model_path, self.config.model_data_path, self.config.intents_path)
+        trainer.train_and_save(self.config.model_path, self.config.intents_path)
         print ("Intent training complete.")
 
+    def search_intent_hyperparameters(self):
+        print ("Cross validating intent classifier hyperparameters...")
+        from intents import Trainer
+        trainer = Trainer(self.config.intents_path)
+        trainer.model_data.parse_intents(self.config.intents_path)
+        trainer.model_data.prepare_data()
+        results = trainer.search_hyperparameters({
+            "batch_size": [8, 32, None],
+            "lr": [0.001, 0.005],
+            "epochs": [50, 100, 200],
+        })
+        for params, accuracy, std in results[:5]:
+            print(f"{accuracy:.2%} ± {std:.2%}  {params}")
+
+    def suggest_intent_patterns(self, top_n=20):
+        """Rank the messages of the exceptions log as new intents.json patterns and save them for review."""
+        from intents.exception_log import ExceptionLog, read_exception_log
+        from intents.exception_miner import as_intents, suggest_patterns
+
+        log_paths = ExceptionLog(self.config.exceptions_path).files()
+        if self.config.legacy_exceptions_path.exists():
+            log_paths.insert(0, self.config.legacy_exceptions_path)
+        records = read_exception_log(log_paths)
+
+        with open(self.config.intents_path, 'r', encoding='utf-8') as f:
+            known_patterns = [pattern for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+        with open(self.config.processed_entity_label_data_path, 'r', encoding='utf-8') as f:
+            entity_patterns = {entity['label']: entity['patterns'] for entity in json.load(f)['entities']}
+        candidates = suggest_patterns(records, known_patterns, entity_patterns)
+        print(f"{len(candidates)} candidate patterns from {len(records)} logged messages")
+        for candidate in candidates[:top_n]:
+            print(f"{candidate.count:>5}  {str(candidate.tag):<14} {candidate.mean_confidence:.2f}  {candidate.pattern}")
+
+        with open(self.config.candidate_patterns_path, 'w', encoding='utf-8') as f:
+            json.dump(as_intents(candidates), f, indent=2)
+        print(f"Saved the candidates to {self.config.candidate_patterns_path}, review them before adding them to intents.json")
+
     def train_spell_embeddings(self):
         """Load entries from JSON and process them."""
 
@@ -49,11 +89,15 @@ class ChatbotTrainer(ChatbotTrainerInterface):
                 entry_text += " " + entry['cantripUpgrade']
             entries.append(RawEntry(entry['name'], entry_text))
 
-        # Load and process the spells
+        # Only re-embed spells that were added or changed since the last run
         chunker = SentenceChunker()
-        embedder = Embedder(self.config.spells_db_path)
-        chunked_entries = chunker.chunk_entries(entries)
-        embedder.process_entries(chunked_entries)
+        embedder = Embedder(self.config.spells_db_path, context_featurizer=SpellKeywordBooster())
+        embedder.update_entries(entries, chunker)
+
+        # Export the embeddings for the in-memory search index used when chatting
+        conn = connect(self.config.spells_db_path)
+        NumpyVectorIndex.export(conn, self.config.vector_index_dir)
+        conn.close()
 
     def train_entity_classifier(self):
         print("Starting entity classifier training process...")
@@ -70,6 +114,8 @@ class ChatbotTrainer(ChatbotTrainerInterface):
             print ("1. Data Preprocessing")
             print ("2. Intent Classifier")
             print ("3. Spell Embeddings")
+            print ("4. Intent Classifier Hyperparameter Search")
+            print ("5. Suggest Intent Patterns From The Exceptions Log")
             print ("A. All of the above")
             print ("Q. Quit")
             choice = input("You: ").strip()
@@ -79,6 +125,10 @@ class ChatbotTrainer(ChatbotTrainerInterface):
                 self.train_intents()
             elif choice == '3':
                 self.train_spell_embeddings()
+            elif choice == '4':
+                self.search_intent_hyperparameters()
+            elif choice == '5':
+                self.suggest_intent_patterns()
             elif choice.lower() == 'a':
                 self.preprocess_data()
                 self.train_intents()
@@ -87,5 +137,5 @@ class ChatbotTrainer(ChatbotTrainerInterface):
                 print("Exiting training.")
                 exit()
             else:
-                print("Invalid choice. Please enter 1, 2, 3, or 'q' to quit.")
+                print("Invalid choice. Please enter 1, 2, 3, 4, 5, 'a' or 'q' to quit.")
                 continue
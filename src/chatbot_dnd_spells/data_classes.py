@@ -0,0 +1,18 @@
+from dataclasses import dataclass, field
+
+# Stages of a turn in the order they run, see Chatbot.handle_turn
+TURN_STAGES = ("resolve", "intent", "ner", "fetch", "vector_search", "format")
+
+@dataclass
+class TurnResult:
+    message: str
+    response: str
+    intent: str | None
+    # confidence of the intent classifier, even when the intent was below the threshold
+    confidence: float
+    # seconds spent in each of TURN_STAGES, 0 for stages the turn skipped
+    timings: dict[str, float] = field(default_factory=lambda: dict.fromkeys(TURN_STAGES, 0.0))
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.timings.values())
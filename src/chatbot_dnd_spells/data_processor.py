@@ -1,7 +1,53 @@
 import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 import nltk
 from ordinal import ordinal
 
+# Below this many spells starting the worker processes costs more than it saves
+PARALLEL_MIN_SPELLS = 500
+
+# Sentences mentioning these are about resisting damage, not dealing it
+_RESISTANCE_WORDS = frozenset(["resistance", "immunity", "vulnerability"])
+
+
+class DamageTypeFinder:
+    """Finds the damage types a spell deals, picklable so it can be sent to worker processes."""
+
+    def __init__(self, damage_types: list[str]):
+        self.damage_types = damage_types
+        # lowercased damage type -> damage types with that spelling, in damage_types order
+        self.by_word: dict[str, list[str]] = {}
+        for damage_type in damage_types:
+            self.by_word.setdefault(damage_type.lower(), []).append(damage_type)
+        # Descriptions without any damage type anywhere are skipped without tokenizing them
+        self.pattern = re.compile("|".join(map(re.escape, sorted(self.by_word, key=len, reverse=True)))) if self.by_word else None
+
+    def find(self, description: str) -> list[str]:
+        """Damage types mentioned as a word of a sentence that isn't about resistances, without duplicates"""
+        if self.pattern is None or not self.pattern.search(description.lower()):
+            return []
+
+        found = {}
+        for sentence in nltk.sent_tokenize(description):
+            sentence_words = {word.lower() for word in nltk.word_tokenize(sentence)}
+            # Ignore sentences that mention resistances, immunities, or vulnerabilities
+            if sentence_words & _RESISTANCE_WORDS:
+                continue
+            for word in sentence_words & self.by_word.keys():
+                found.update(dict.fromkeys(self.by_word[word]))
+        # damage_types order so the output is the same every run
+        return [damage_type for damage_type in self.damage_types if damage_type in found]
+
+    def process_spell(self, spell: dict) -> dict:
+        damage_types = self.find(spell.get("description", ""))
+        if damage_types:
+            spell["damageTypes"] = spell.get("damageTypes") or []
+            spell["damageTypes"] = list(dict.fromkeys(spell["damageTypes"] + damage_types))
+        return spell
+
+
 class DataProcessor:
     def __init__(self, raw_spell_data_path, raw_entity_data_path, processed_spell_data_path, processed_entity_data_path):
 
@@ -21,34 +67,43 @@ class DataProcessor:
         self.process_spell_data()
         self.process_entity_data()
 
-    def process_spell_data(self):
-        """Process raw spell data and extract the damage types from descriptions"""
+    def process_spell_data(self, max_workers=None):
+        """
+        Process raw spell data and extract the damage types from descriptions
+
+        Spells are processed in a process pool once there are at least PARALLEL_MIN_SPELLS of them
+        and written to the processed file one at a time.
+        """
         # Get a list of damage types from entity data
         damage_types = []
         for entity in self.entity_data.get("entities", []):
             if entity["label"] == "DAMAGE_TYPE":
                 damage_types.extend(entity["patterns"])
+        finder = DamageTypeFinder(damage_types)
 
-        # Process each spell description to find sentences mentioning damage types
-        for spell in self.spell_data["spells"]:
-            description = spell.get("description", "")
-            sentences = nltk.sent_tokenize(description)
-            for sentence in sentences:
-                sentence_words = [word.lower() for word in nltk.word_tokenize(sentence)]
-                # Ignore sentences that mention resistances, immunities, or vulnerabilities
-                if not any(word in sentence_words for word in ["resistance", "immunity", "vulnerability"]):
-                    for damage_type in damage_types:
-                        if damage_type.lower() in sentence_words:
-                            # Found a damage type mention, add to processed data
-                            # Ensure damageTypes is a list
-                            if not spell.get("damageTypes"):
-                                spell["damageTypes"] = []
-                            spell["damageTypes"].append(damage_type)
-            if spell.get("damageTypes"):
-                # Remove duplicates
-                spell["damageTypes"] = list(set(spell["damageTypes"]))
+        spells = self.spell_data["spells"]
+        if len(spells) < PARALLEL_MIN_SPELLS or max_workers == 1:
+            processed_spells = map(finder.process_spell, spells)
+            self.spell_data["spells"] = self._write_spells(processed_spells)
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # a few chunks per worker keeps the workers busy without sending every spell separately
+            chunksize = max(1, len(spells) // ((max_workers or os.cpu_count() or 1) * 4))
+            processed_spells = executor.map(finder.process_spell, spells, chunksize=chunksize)
+            self.spell_data["spells"] = self._write_spells(processed_spells)
+
+    def _write_spells(self, spells) -> list[dict]:
+        """Write the processed spell data as each spell arrives, formatted like json.dump with indent=2."""
+        written = []
         with open(self.processed_spell_data_path, "w", encoding="utf-8") as f:
-            json.dump(self.spell_data, f, indent=2)
+            f.write('{\n  "spells": [')
+            for spell in spells:
+                f.write(",\n    " if written else "\n    ")
+                f.write(json.dumps(spell, indent=2).replace("\n", "\n    "))
+                written.append(spell)
+            f.write("\n  ]\n}" if written else "]\n}")
+        return written
 
     def process_entity_data(self):
         """Add all spells to the entity data for the SPELL entity"""
@@ -1,45 +1,34 @@
 from embeddings import VectorSearcher
-import re
+from embeddings.embedding_cache import EmbeddingCache
 from utils.colors import YELLOW, RESET
+from utils.ttl_cache import TTLCache, MISSING
+from .spell_keyword_booster import SpellKeywordBooster
 
 class SpellVectorSearcher(VectorSearcher):
-    def __init__(self, db_path):
+    def __init__(self, db_path, cache_path=None, response_cache_size=512, response_cache_ttl=3600.0, spell_repository=None, index_dir=None, quantize=False):
         """Initialize the spell searcher."""
-        super().__init__(db_path)
+        super().__init__(db_path, cache_path=cache_path, index_dir=index_dir, quantize=quantize)
         self.debug = False
-    
-    def _calculate_keyword_boost(self, query, sentence):
-        """Calculate keyword relevance boost."""
-        query_words = set(query.lower().split())
-        sentence_words = set(sentence.lower().split())
-        
-        boost_score = 0.0
-
-        # Boost for damage + die roll pattern e.g. 8d6 or 1d10
-        if 'damage' in query.lower() and re.search(r'\b\d+d\d+\b', sentence):
-            boost_score += 0.2
-        
-        # Boost for quantity questions and numbers
-        # Only boost if a standalone number is present, but NOT if "damage" appears exactly two words after the number
-        if any(word in query.lower() for word in ['how many', 'number']):
-            # Match a number not followed by a word and then "damage" ie Force damage or Fire damage
-            # and NOT if the number is preceded by "level above" (e.g., "level above 5")
-            number_pattern = r'\b(?<!level above\s)(\d+)\b(?!\s+\w+\s+damage\b)'
-            word_number_pattern = r'\b(one|two|three|four|five|six|seven|eight|nine|ten)\b'
-            # Check for digit numbers not preceded by "level"/"levels" and not followed by "damage"
-            if re.search(number_pattern, sentence.lower()) or \
-                (re.search(word_number_pattern, sentence.lower()) and not re.search(r'(level|levels)\s+(one|two|three|four|five|six|seven|eight|nine|ten)\b', sentence.lower())):
-                boost_score += 0.2
-        
-        if any(word in query.lower() for word in ['save', 'saving throw']) and 'saving throw' in sentence.lower():
-            boost_score += 0.2
+        # used to display spell names with their original casing, the db stores them lowercased
+        self.spell_repository = spell_repository
+        self.keyword_booster = SpellKeywordBooster()
 
-        if any(word in query.lower() for word in ['aoe', 'area of effect', 'radius', 'area', 'diameter']) and \
-            any(word in sentence.lower() for word in ['radius', 'area of effect', 'sphere', 'cylinder', 'cone', 'cube', 'line', 'diameter']):
-            boost_score += 0.2
-        return boost_score
+        # Final answers keyed on spell, normalized query and search parameters
+        # Cleared whenever spells.db changes underneath us
+        self.response_cache = TTLCache(response_cache_size, response_cache_ttl)
+        self._response_cache_db_version = self.db_version()
+    
+    def search_batch(self, queries, spell_names, rec_score=0.5, min_score=0.4, max_results=5, mode="vector"):
+        """Search several queries, each within its own spell. Uncached queries are encoded in one batch."""
+        if len(queries) != len(spell_names):
+            raise ValueError("Each query needs a spell name.")
+        query_embeddings = self.encode_queries(queries)
+        return [
+            self.search(query, spell_name, rec_score, min_score, max_results, mode, query_embedding)
+            for query, spell_name, query_embedding in zip(queries, spell_names, query_embeddings)
+        ]
 
-    def search(self, query, spell_name, rec_score=0.5, min_score=0.4, max_results=5):
+    def search(self, query, spell_name, rec_score=0.5, min_score=0.4, max_results=5, mode="vector", query_embedding=None):
         """
         Search for information in spells and return ordered results.
         
@@ -47,17 +36,49 @@ class SpellVectorSearcher(VectorSearcher):
             query: User's question
             min_score: Minimum similarity score to consider
             max_results: Maximum number of results to return
+            mode: "vector" or "hybrid" (vector + BM25 keyword ranking), see VectorSearcher.search
+            query_embedding: Embedding of the query if it's already been encoded
         
         Returns:
             Ordered text response
         """
-        results = super().search(query, spell_name, 25) # get a bunch we'll filter them here
+        # Skip the cache in debug mode so the scores get printed
+        if self.debug:
+            return self._search(query, spell_name, rec_score, min_score, max_results, mode, query_embedding)
+
+        db_version = self.db_version()
+        if db_version != self._response_cache_db_version:
+            self.response_cache.clear()
+            self._response_cache_db_version = db_version
+
+        key = (spell_name.lower(), EmbeddingCache.normalize(query), rec_score, min_score, max_results, mode)
+        response = self.response_cache.get(key, MISSING)
+        if response is MISSING:
+            response = self._search(query, spell_name, rec_score, min_score, max_results, mode, query_embedding)
+            self.response_cache.put(key, response)
+        return response
+
+    def _search(self, query, spell_name, rec_score, min_score, max_results, mode, query_embedding=None):
+        """Run the vector search and build the response, see search."""
+        if mode == "hybrid":
+            # keyword matches are already ranked near the top so we don't need to oversample as much
+            candidates = max_results * 3
+        else:
+            candidates = 25 # get a bunch we'll filter them here
+        results = super().search(query, spell_name, candidates, mode, query_embedding)
 
         # Apply keyword boosting
+        # The query side of the rules is evaluated once, sentence features come precomputed from the db
+        query_boosts = self.keyword_booster.query_boosts(query)
         boosted_results = []
         failover_results = []
         for result in results:
-            keyword_boost = self._calculate_keyword_boost(query, result.chunk_context)
+            keyword_boost = 0.0
+            if query_boosts:
+                features = result.features
+                if features is None:
+                    features = self.keyword_booster.features(result.chunk_context)
+                keyword_boost = self.keyword_booster.boost(query_boosts, features)
             boosted_similarity = result.similarity_score + keyword_boost
 
             result.similarity_score = boosted_similarity
@@ -103,3 +124,33 @@ class SpellVectorSearcher(VectorSearcher):
         response = " ".join(response_parts)
 
         return f"According to {spell_name}: {response}"
+
+    def search_spells(self, query, min_score=0.5, max_spells=3):
+        """
+        Search every spell for ones matching the query e.g. "which spells let me teleport?"
+
+        Args:
+            query: User's question
+            min_score: Minimum similarity score of a spell's best sentence
+            max_spells: Maximum number of spells to return
+
+        Returns:
+            Text response listing the spells with their best supporting sentence, or None if nothing matched
+        """
+        entries = [entry for entry in self.search_entries(query, top_n=max_spells, chunks_per_entry=1) if entry.similarity_score >= min_score]
+
+        if self.debug:
+            print(f"{YELLOW}Debug: Search results across all spells | Minimum score: {min_score}{RESET}")
+            for entry in entries:
+                print(f"{YELLOW}score: {entry.similarity_score:.3f} - {entry.name}: {entry.chunks[0].chunk_context}{RESET}")
+
+        if not entries:
+            return None
+
+        response = "These spells might be what you're looking for:"
+        for entry in entries:
+            name = entry.name
+            if self.spell_repository:
+                name = self.spell_repository.get(name).get("name", name)
+            response += f"\n- {name}: {entry.chunks[0].chunk_context}"
+        return response
@@ -1,6 +1,10 @@
 from entity_recognition import SingleFuzzyClassifier
 
 class SpellEntityClassifier(SingleFuzzyClassifier):
+    def __init__(self, entity_classifier_path, min_score=0, exact_match=True, workers=1):
+        # Most messages spell entities correctly, so exact matching runs first by default
+        super().__init__(entity_classifier_path, min_score, exact_match, workers)
+
     def _extract_key_value(self, text, label):
         """Extract the key part from matched entities based on label type"""
         if label == "SAVING_THROW":
@@ -0,0 +1,82 @@
+import re
+from dataclasses import dataclass
+from embeddings.context_featurizer_interface import ContextFeaturizerInterface
+
+# Bump when the sentence features change so the trainer recomputes them
+FEATURES_VERSION = 1
+
+@dataclass(frozen=True)
+class BoostRule:
+    # sentence feature the rule rewards
+    feature: str
+    # the rule applies if any of these appear in the lowercased query
+    query_triggers: tuple[str, ...]
+    boost: float = 0.2
+
+# Declarative rule table, each rule boosts sentences having its feature when the query mentions a trigger
+BOOST_RULES = (
+    # damage questions and die rolls e.g. 8d6 or 1d10
+    BoostRule("dice", ("damage",)),
+    # quantity questions and numbers
+    BoostRule("number", ("how many", "number")),
+    BoostRule("saving_throw", ("save", "saving throw")),
+    BoostRule("area", ("aoe", "area of effect", "radius", "area", "diameter")),
+)
+
+_DICE_PATTERN = re.compile(r'\b\d+d\d+\b')
+# Match a number not followed by a word and then "damage" ie Force damage or Fire damage
+# and NOT if the number is preceded by "level above" (e.g., "level above 5")
+_NUMBER_PATTERN = re.compile(r'\b(?<!level above\s)(\d+)\b(?!\s+\w+\s+damage\b)')
+_WORD_NUMBER_PATTERN = re.compile(r'\b(one|two|three|four|five|six|seven|eight|nine|ten)\b')
+_LEVEL_WORD_NUMBER_PATTERN = re.compile(r'(level|levels)\s+(one|two|three|four|five|six|seven|eight|nine|ten)\b')
+_AREA_PATTERN = re.compile(r'radius|area of effect|sphere|cylinder|cone|cube|line|diameter')
+
+
+def _has_number(sentence_lower):
+    # Check for digit numbers not preceded by "level above" and not followed by "damage"
+    # or spelled out numbers that aren't a level
+    return bool(_NUMBER_PATTERN.search(sentence_lower)) or \
+        (bool(_WORD_NUMBER_PATTERN.search(sentence_lower)) and not _LEVEL_WORD_NUMBER_PATTERN.search(sentence_lower))
+
+# feature name -> test on (sentence, lowercased sentence)
+SENTENCE_FEATURES = {
+    "dice": lambda sentence, sentence_lower: bool(_DICE_PATTERN.search(sentence)),
+    "number": lambda sentence, sentence_lower: _has_number(sentence_lower),
+    "saving_throw": lambda sentence, sentence_lower: 'saving throw' in sentence_lower,
+    "area": lambda sentence, sentence_lower: bool(_AREA_PATTERN.search(sentence_lower)),
+}
+
+
+class SpellKeywordBooster(ContextFeaturizerInterface):
+    """
+    Keyword relevance boosting for spell search results.
+
+    Sentence features are extracted once per chunk context when the spells are embedded and stored in
+    spells.db. At query time the rules are evaluated once for the query and each result's boost is just
+    the intersection of the query's rules with the sentence's features.
+    """
+
+    def __init__(self, rules=BOOST_RULES):
+        self.rules = rules
+
+    def signature(self) -> str:
+        return f"{type(self).__name__}(v{FEATURES_VERSION})"
+
+    def features(self, text: str) -> frozenset[str]:
+        """Extract the sentence side features used by the boost rules."""
+        text_lower = text.lower()
+        return frozenset(name for name, test in SENTENCE_FEATURES.items() if test(text, text_lower))
+
+    def query_boosts(self, query: str) -> dict[str, float]:
+        """Get the boost for each sentence feature the query asks about."""
+        query_lower = query.lower()
+        boosts = {}
+        for rule in self.rules:
+            if any(trigger in query_lower for trigger in rule.query_triggers):
+                boosts[rule.feature] = boosts.get(rule.feature, 0.0) + rule.boost
+        return boosts
+
+    @staticmethod
+    def boost(query_boosts: dict[str, float], features: frozenset[str]) -> float:
+        """Calculate the boost for a sentence given the query's boosts and the sentence's features."""
+        return sum(query_boosts[feature] for feature in query_boosts.keys() & features)
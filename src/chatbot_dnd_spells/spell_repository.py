@@ -0,0 +1,82 @@
+import json
+from collections import defaultdict
+
+class SpellRepository:
+    """In-memory spell store loaded once, with name lookup and inverted indexes for filtering."""
+
+    def __init__(self, spells: list[dict]):
+        # keep the spells sorted by level and then alphabetically so filtered results come out in display order
+        self.spells: list[dict] = sorted(spells, key=lambda x: (x.get("level", 0), x.get("name", "")))
+
+        # lowercased spell name -> spell data
+        self.by_name: dict[str, dict] = {}
+        # posting sets mapping an attribute value to the positions of the spells that have it
+        self.by_class: dict[str, set[int]] = defaultdict(set)
+        self.by_level: dict[int, set[int]] = defaultdict(set)
+        self.by_school: dict[str, set[int]] = defaultdict(set)
+        self.by_damage_type: dict[str, set[int]] = defaultdict(set)
+
+        for i, spell in enumerate(self.spells):
+            self.by_name[spell["name"].lower()] = spell
+            for spell_class in spell.get("classes", []):
+                self.by_class[spell_class.lower()].add(i)
+            self.by_level[int(spell.get("level", 0))].add(i)
+            if spell.get("school"):
+                self.by_school[spell["school"].lower()].add(i)
+            for damage_type in spell.get("damageTypes") or []:
+                self.by_damage_type[damage_type.lower()].add(i)
+
+    @classmethod
+    def load(cls, spell_data_path):
+        """Load the processed spell data from a JSON file."""
+        with open(spell_data_path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get('spells', []))
+
+    def get(self, name: str) -> dict:
+        """Get a spell by name (case insensitive). Returns an empty dict if the spell doesn't exist."""
+        if not name:
+            return {}
+        return self.by_name.get(name.lower(), {})
+
+    def filter(self, spell_class=None, level=None, school=None, damage_type=None) -> list[dict]:
+        """
+        Get every spell matching all of the given criteria.
+
+        Args:
+            spell_class: Class that must be able to cast the spell
+            level: Spell level (0 for cantrips)
+            school: School of magic
+            damage_type: Damage type the spell deals
+
+        Returns:
+            List of spells sorted by level and then alphabetically
+        """
+        postings = []
+        if spell_class is not None:
+            postings.append(self.by_class.get(spell_class.lower(), set()))
+        if level is not None:
+            # levels come through the entity classifier as strings e.g. "3"
+            try:
+                postings.append(self.by_level.get(int(level), set()))
+            except ValueError:
+                return []
+        if school is not None:
+            postings.append(self.by_school.get(school.lower(), set()))
+        if damage_type is not None:
+            postings.append(self.by_damage_type.get(damage_type.lower(), set()))
+
+        if not postings:
+            return list(self.spells)
+
+        # intersect starting with the smallest set to keep the work proportional to the result
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            matches &= posting
+            if not matches:
+                return []
+
+        return [self.spells[i] for i in sorted(matches)]
+
+    def __len__(self):
+        return len(self.spells)
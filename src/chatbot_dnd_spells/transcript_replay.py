@@ -0,0 +1,73 @@
+"""
+Replay scripted conversations through Chatbot.handle_turn and break the latency down per stage
+
+Transcript files have one user message per line. A line of "---" starts a new conversation with a fresh
+session, lines starting with "#" and blank lines are ignored.
+"""
+import json
+import numpy as np
+from .chat_session import ChatSession
+from .data_classes import TurnResult, TURN_STAGES
+
+CONVERSATION_SEPARATOR = "---"
+
+
+def read_transcript(path) -> list[list[str]]:
+    """Read the messages of each conversation in a transcript file."""
+    conversations = [[]]
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line == CONVERSATION_SEPARATOR:
+                conversations.append([])
+            else:
+                conversations[-1].append(line)
+    return [conversation for conversation in conversations if conversation]
+
+
+def replay(chatbot, conversations: list[list[str]]) -> list[list[TurnResult]]:
+    """Send every conversation through the chatbot, each in its own session."""
+    results = []
+    for i, conversation in enumerate(conversations):
+        session = ChatSession(f"replay-{i}")
+        results.append([chatbot.handle_turn(session, message) for message in conversation])
+    return results
+
+
+def stage_breakdown(turns: list[TurnResult]) -> dict[str, dict[str, float]]:
+    """Latency statistics in milliseconds for each stage and the whole turn, with each stage's share of the total time."""
+    breakdown = {}
+    total_time = sum(turn.total_time for turn in turns)
+    for stage in (*TURN_STAGES, "total"):
+        times = np.array([turn.total_time if stage == "total" else turn.timings[stage] for turn in turns]) * 1e3
+        breakdown[stage] = {
+            "mean_ms": float(times.mean()) if len(times) else 0.0,
+            "p50_ms": float(np.percentile(times, 50)) if len(times) else 0.0,
+            "p99_ms": float(np.percentile(times, 99)) if len(times) else 0.0,
+            "max_ms": float(times.max()) if len(times) else 0.0,
+            "share": float(times.sum() / 1e3 / total_time) if total_time else 0.0,
+        }
+    return breakdown
+
+
+def print_breakdown(breakdown: dict[str, dict[str, float]], turns: int):
+    print(f"{turns} turns")
+    print(f"{'stage':<14}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'share':>8}")
+    for stage, stats in breakdown.items():
+        print(f"{stage:<14}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+              f"{stats['max_ms']:>10.2f}{stats['share']:>8.1%}")
+
+
+def save_turns(path, conversations: list[list[TurnResult]]):
+    """Write every turn with its response and timings as JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([
+            [
+                {"message": turn.message, "response": turn.response, "intent": turn.intent,
+                 "confidence": turn.confidence, "timings": turn.timings}
+                for turn in conversation
+            ]
+            for conversation in conversations
+        ], f, indent=2)
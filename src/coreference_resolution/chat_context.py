@@ -1,4 +1,3 @@
-import json
 from .data_classes import Message, Role
 from entity_recognition.data_classes import Prediction
 
@@ -21,21 +20,5 @@ class ChatContext:
         self.chat_history.append(Message(user_message, Role.USER))
         self.chat_history.append(Message(bot_response, Role.BOT))
 
-    def fetch_data(self, file_path, key, value):
-        """Fetch data from a JSON file based on a key-value pair."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data['spells']:
-                    if item.get(key).lower() == value.lower():
-                        return item
-            return {}
-        except FileNotFoundError:
-            print(f"File not found: {file_path}")
-            return {}
-        except json.JSONDecodeError:
-            print(f"Error decoding JSON from file: {file_path}")
-            return {}
-
     def get_chat_history(self):
         return self.chat_history
\ No newline at end of file
@@ -7,4 +7,8 @@ class ContextChunkerInterface(ABC):
     @abstractmethod
     def chunk_entries(self, entries: list[RawEntry]) -> list[ChunkedEntry]:
         """Break text into smaller overlapping chunks"""
-        pass
\ No newline at end of file
+        pass
+
+    def signature(self) -> str:
+        """Describe the chunker and its parameters. Changing it invalidates previously stored embeddings"""
+        return type(self).__name__
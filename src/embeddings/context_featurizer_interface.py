@@ -0,0 +1,12 @@
+
+from abc import ABC, abstractmethod
+
+class ContextFeaturizerInterface(ABC):
+    @abstractmethod
+    def features(self, text: str) -> frozenset[str]:
+        """Extract named features from a chunk context so they can be stored alongside it"""
+        pass
+
+    def signature(self) -> str:
+        """Describe the featurizer and its rules. Changing it invalidates previously stored features"""
+        return type(self).__name__
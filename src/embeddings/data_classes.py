@@ -25,4 +25,17 @@ class ChunkResult:
     chunk_text: str
     chunk_context: str
     position: int
-    similarity_score: float
\ No newline at end of file
+    similarity_score: float
+    # features precomputed for the chunk context at embedding time, None if the database doesn't have them
+    features: frozenset[str] | None = None
+    # hybrid search only: BM25 score (higher is better, 0 if no keyword matched) and the fused ranking score
+    keyword_score: float | None = None
+    fused_score: float | None = None
+
+@dataclass
+class EntryResult:
+    name: str
+    # similarity of the entry's best matching chunk
+    similarity_score: float
+    # best supporting chunks, best first
+    chunks: list[ChunkResult]
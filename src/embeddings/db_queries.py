@@ -1,36 +1,77 @@
-def insert_entry(conn, name):
-    cursor = conn.execute('''
-        INSERT INTO entries (name)
-        VALUES (?)
-    ''', (name.lower(),)
-    )
-    return cursor.lastrowid
-
-def insert_chunk_context(conn, entry_id, text, position):
-    cursor = conn.execute('''
-        INSERT INTO chunk_context (entry_id, text, position)
-        VALUES (?, ?, ?)
-    ''', (entry_id, text, position))
-    return cursor.lastrowid
+def next_id(conn, table):
+    """Get the next free id of a table so rows can be bulk inserted with known ids."""
+    (max_id,) = conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()
+    return (max_id or 0) + 1
 
-def insert_chunk(conn, chunk_context_id, text):
-    cursor = conn.execute('''
-        INSERT INTO chunks (chunk_context_id, text)
+def insert_entries(conn, rows):
+    # rows: (id, name)
+    conn.executemany('''
+        INSERT INTO entries (id, name)
         VALUES (?, ?)
-    ''', (chunk_context_id, text))
-    return cursor.lastrowid
+    ''', [(entry_id, name.lower()) for entry_id, name in rows])
+
+def insert_chunk_contexts(conn, rows):
+    # rows: (id, entry_id, text, position, features)
+    conn.executemany('''
+        INSERT INTO chunk_context (id, entry_id, text, position, features)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+
+def insert_chunks(conn, rows):
+    # rows: (id, chunk_context_id, text)
+    conn.executemany('''
+        INSERT INTO chunks (id, chunk_context_id, text)
+        VALUES (?, ?, ?)
+    ''', rows)
 
-def insert_embedding(conn, chunk_id, embedding):
-    conn.execute('''
+def insert_embeddings(conn, chunk_ids, embeddings):
+    # embeddings: 2D float32 array with one row per chunk id
+    conn.executemany('''
         INSERT INTO embeddings (chunk_id, embedding)
         VALUES (?, ?)
-    ''', (chunk_id, embedding.tobytes()))
+    ''', [(chunk_id, embedding.tobytes()) for chunk_id, embedding in zip(chunk_ids, embeddings)])
+
+def get_entry_hashes(conn):
+    return dict(conn.execute('SELECT name, content_hash FROM entry_hashes').fetchall())
+
+def upsert_entry_hashes(conn, rows):
+    # rows: (name, content_hash)
+    conn.executemany('''
+        INSERT INTO entry_hashes (name, content_hash)
+        VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET content_hash = excluded.content_hash
+    ''', [(name.lower(), content_hash) for name, content_hash in rows])
+
+def delete_entries(conn, names):
+    """Delete entries and all of their chunk contexts, chunks, embeddings and hashes."""
+    names = [(name.lower(),) for name in names]
+    chunk_ids = [(chunk_id,) for name in names for (chunk_id,) in conn.execute('''
+        SELECT c.id
+        FROM chunks c
+        JOIN chunk_context cc ON c.chunk_context_id = cc.id
+        JOIN entries e ON cc.entry_id = e.id
+        WHERE e.name = ?
+    ''', name).fetchall()]
+    # vec0 tables delete by primary key
+    conn.executemany('DELETE FROM embeddings WHERE chunk_id = ?', chunk_ids)
+    conn.executemany('''
+        DELETE FROM chunks WHERE chunk_context_id IN (
+            SELECT cc.id FROM chunk_context cc JOIN entries e ON cc.entry_id = e.id WHERE e.name = ?
+        )
+    ''', names)
+    conn.executemany('''
+        DELETE FROM chunk_context WHERE entry_id IN (SELECT id FROM entries WHERE name = ?)
+    ''', names)
+    conn.executemany('DELETE FROM entries WHERE name = ?', names)
+    conn.executemany('DELETE FROM entry_hashes WHERE name = ?', names)
 
-def get_embeddings_for_entry(conn, query_embedding, entry_name, top_k):
-    # Create query embedding
-    return conn.execute('''
+def get_embeddings_for_entry(conn, query_embedding, entry_name, top_k, with_features=True):
+    # Older databases don't have the features column
+    features_column = 'cc.features' if with_features else 'NULL'
+    return conn.execute(f'''
         SELECT cc.text, c.text, cc.position,
-            vec_distance_cosine(em.embedding, ?) as distance
+            vec_distance_cosine(em.embedding, ?) as distance,
+            {features_column}
         FROM chunk_context cc
         JOIN chunks c ON cc.id = c.chunk_context_id
         JOIN embeddings em ON c.id = em.chunk_id
@@ -38,4 +79,71 @@ def get_embeddings_for_entry(conn, query_embedding, entry_name, top_k):
         WHERE e.name = ?
         ORDER BY distance ASC
         LIMIT ?
-    ''', (query_embedding.tobytes(), entry_name, top_k)).fetchall()
\ No newline at end of file
+    ''', (query_embedding.tobytes(), entry_name, top_k)).fetchall()
+
+def get_hybrid_scores_for_entry(conn, query_embedding, fts_query, entry_name, with_features=True):
+    """
+    Get every chunk of an entry with both its cosine distance to the query and its BM25 score.
+
+    The BM25 score is NULL for chunks that don't match the full text query.
+    SQLite's bm25() is negative, lower is a better match.
+    """
+    features_column = 'cc.features' if with_features else 'NULL'
+    return conn.execute(f'''
+        WITH candidates AS (
+            SELECT c.id AS chunk_id, cc.text AS context_text, c.text AS chunk_text, cc.position, {features_column} AS features
+            FROM chunk_context cc
+            JOIN chunks c ON cc.id = c.chunk_context_id
+            JOIN entries e ON cc.entry_id = e.id
+            WHERE e.name = ?
+        ),
+        keyword AS (
+            SELECT rowid AS chunk_id, bm25(chunks_fts) AS bm25
+            FROM chunks_fts
+            WHERE chunks_fts MATCH ? AND rowid IN (SELECT chunk_id FROM candidates)
+        )
+        SELECT cand.context_text, cand.chunk_text, cand.position,
+            vec_distance_cosine(em.embedding, ?) AS distance,
+            cand.features,
+            k.bm25
+        FROM candidates cand
+        JOIN embeddings em ON em.chunk_id = cand.chunk_id
+        LEFT JOIN keyword k ON k.chunk_id = cand.chunk_id
+    ''', (entry_name, fts_query, query_embedding.tobytes())).fetchall()
+
+def get_nearest_chunks(conn, query_embedding, k, with_features=True):
+    """
+    Get the k nearest chunks across every entry using the vec0 KNN index.
+
+    Returns rows of (entry name, chunk context text, chunk text, position, distance, features) nearest first.
+    """
+    features_column = 'cc.features' if with_features else 'NULL'
+    return conn.execute(f'''
+        WITH knn AS (
+            SELECT chunk_id, distance
+            FROM embeddings
+            WHERE embedding MATCH ? AND k = ?
+        )
+        SELECT e.name, cc.text, c.text, cc.position, knn.distance, {features_column}
+        FROM knn
+        JOIN chunks c ON c.id = knn.chunk_id
+        JOIN chunk_context cc ON cc.id = c.chunk_context_id
+        JOIN entries e ON e.id = cc.entry_id
+        ORDER BY knn.distance ASC
+    ''', (query_embedding.tobytes(), k)).fetchall()
+
+def get_all_embeddings(conn, with_features=True):
+    """
+    Get every chunk with its embedding, grouped by entry and in sentence order.
+
+    Returns rows of (entry name, chunk context text, chunk text, position, features, embedding bytes).
+    """
+    features_column = 'cc.features' if with_features else 'NULL'
+    return conn.execute(f'''
+        SELECT e.name, cc.text, c.text, cc.position, {features_column}, em.embedding
+        FROM entries e
+        JOIN chunk_context cc ON cc.entry_id = e.id
+        JOIN chunks c ON c.chunk_context_id = cc.id
+        JOIN embeddings em ON em.chunk_id = c.id
+        ORDER BY e.id, cc.position, c.id
+    ''').fetchall()
@@ -1,21 +1,27 @@
+import hashlib
 import sqlite3
 import sqlite_vec
 
-def connect(db_path):
-    conn = sqlite3.connect(db_path)
+def connect(db_path, check_same_thread=True):
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
     conn.enable_load_extension(True)
     sqlite_vec.load(conn)
     conn.enable_load_extension(False)
     return conn
 
-def setup(conn, embedding_dim):
+def reset(conn):
     # Remove old tables if they exist
     conn.execute('DROP INDEX IF EXISTS idx_entry_name')
     conn.execute('DROP TABLE IF EXISTS entries')
     conn.execute('DROP TABLE IF EXISTS chunk_context')
+    conn.execute('DROP TABLE IF EXISTS chunks_fts')
     conn.execute('DROP TABLE IF EXISTS chunks')
     conn.execute('DROP TABLE IF EXISTS embeddings')
+    conn.execute('DROP TABLE IF EXISTS entry_hashes')
+    conn.execute('DROP TABLE IF EXISTS metadata')
+    conn.commit()
 
+def setup(conn, embedding_dim):
     # Table creation
     # An entry represents a logical grouping within the full text
     # In a book this could be a chapter or a section
@@ -36,9 +42,14 @@ def setup(conn, embedding_dim):
             entry_id INTEGER,
             text TEXT NOT NULL,
             position INTEGER NOT NULL,
+            features TEXT,
             FOREIGN KEY (entry_id) REFERENCES entries (id)
         )
     ''')
+    # Databases built before features existed get the column added
+    # Their rows have no features until they're re-embedded
+    if not has_column(conn, 'chunk_context', 'features'):
+        conn.execute('ALTER TABLE chunk_context ADD COLUMN features TEXT')
 
     # A chunk is a small overlapping part of the entry's text
     # It overlaps with other chunks to preserve context
@@ -57,12 +68,86 @@ def setup(conn, embedding_dim):
     # It represents a vector applying meaning to a chunk of text
     # We can use this to find similar chunks of text
     # Each chunk has one embedding
+    # KNN queries (MATCH ... AND k = ?) use cosine distance
     conn.execute(f'''
         CREATE VIRTUAL TABLE IF NOT EXISTS embeddings USING vec0(
             chunk_id INTEGER PRIMARY KEY,
-            embedding FLOAT[{embedding_dim}]
+            embedding FLOAT[{embedding_dim}] distance_metric=cosine
+        )
+    ''')
+
+    # Full text index over the chunks for BM25 keyword scoring
+    # It's an external content table kept in sync with chunks by triggers
+    fts_exists = has_table(conn, 'chunks_fts')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+            text,
+            content='chunks',
+            content_rowid='id',
+            tokenize='porter unicode61'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+            INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+            INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+    ''')
+    if not fts_exists:
+        # Index chunks that were inserted before the index existed
+        conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+
+    # Content hashes of every embedded entry
+    # The hash covers the entry text and the chunking/embedding parameters
+    # so we only re-embed entries that actually changed
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS entry_hashes (
+            name TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL
         )
     ''')
 
+    # Key/value settings the database was built with
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    conn.executemany('INSERT OR IGNORE INTO metadata (key, value) VALUES (?, ?)', [
+        ('embedding_dim', str(embedding_dim)),
+        ('distance_metric', 'cosine')
+    ])
+
     conn.execute('CREATE INDEX IF NOT EXISTS idx_entry_name ON entries (name)')
-    conn.commit()
\ No newline at end of file
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chunk_context_entry_id ON chunk_context (entry_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_chunk_context_id ON chunks (chunk_context_id)')
+    conn.commit()
+
+def has_table(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone() is not None
+
+def has_column(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+def get_content_version(conn):
+    """Digest of every entry's content hash, it changes whenever an entry is added, changed or removed."""
+    digest = hashlib.sha256()
+    try:
+        for name, content_hash in conn.execute('SELECT name, content_hash FROM entry_hashes ORDER BY name'):
+            digest.update(f"{name}\0{content_hash}\n".encode('utf-8'))
+    except sqlite3.OperationalError:
+        return None
+    return digest.hexdigest()
+
+def get_metadata(conn, key):
+    """Get a metadata value, or None if the database doesn't have it (or was built before metadata existed)."""
+    try:
+        row = conn.execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
\ No newline at end of file
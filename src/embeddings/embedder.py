@@ -1,55 +1,130 @@
-from sentence_transformers import SentenceTransformer
-import math
+import hashlib
+import numpy as np
 
-from embeddings.data_classes import ChunkedEntry
-from .db_setup import connect, setup
+from embeddings.data_classes import ChunkedEntry, RawEntry
+from embeddings.context_chunker_interface import ContextChunkerInterface
+from embeddings.context_featurizer_interface import ContextFeaturizerInterface
+from . import model_registry
+from .db_setup import connect, setup, reset, get_metadata
 from .db_queries import (
-    insert_entry, insert_chunk_context, insert_chunk, insert_embedding
+    next_id, insert_entries, insert_chunk_contexts, insert_chunks, insert_embeddings,
+    get_entry_hashes, upsert_entry_hashes, delete_entries
 )
 
 
 class Embedder:
-    def __init__(self, db_path, model_name="all-MiniLM-L6-v2"):
+    def __init__(self, db_path, model_name=model_registry.DEFAULT_MODEL_NAME, batch_size=64,
+                 context_featurizer: ContextFeaturizerInterface | None = None):
         """
         Initialize the embedder with a database and embedding model.
-        
+
         Args:
             db_path: Path to SQLite database
             model_name: Sentence transformer model name
+            batch_size: Number of chunks sent to the model per encode call
+            context_featurizer: Optional featurizer whose features are stored with each chunk context
         """
         self.db_path = db_path
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model = model_registry.get_model(model_name)
         self.embedding_dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.context_featurizer = context_featurizer
         self.conn = connect(self.db_path)
-    
-    def process_entries(self, chunked_entries: list[ChunkedEntry]):
-        """Process entry data and create embeddings."""
 
-        # Setup database tables
-        print("Setting up database...")
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Encode a list of texts in batches. Returns a float32 array with one row per text."""
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=len(texts) > self.batch_size
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def update_entries(self, raw_entries: list[RawEntry], chunker: ContextChunkerInterface):
+        """
+        Incrementally sync the database with the given entries.
+
+        Only entries whose content hash changed (text, chunker parameters or embedding model) are
+        re-chunked and re-embedded. Entries that are no longer present are removed.
+
+        Args:
+            raw_entries: Every entry that should be in the database
+            chunker: Chunker used to split new or changed entries
+        """
+        stored_dim = get_metadata(self.conn, 'embedding_dim')
+        stored_metric = get_metadata(self.conn, 'distance_metric')
+        if stored_dim is None or int(stored_dim) != self.embedding_dim or stored_metric != 'cosine':
+            print("Database is missing or was built with a different model, rebuilding...")
+            reset(self.conn)
         setup(self.conn, self.embedding_dim)
 
-        print ("Processing entries and creating embeddings...")
-        for i, entry in enumerate(chunked_entries):
-            # Insert spell metadata
-            if (i % 10) == 0:
-                percent_done = math.floor((i+1) / len(chunked_entries) * 100)
-                print(f"Processing entries {percent_done}% complete...")
-            entry_id = insert_entry(self.conn, entry.name)
-            for chunk_context in entry.chunk_contexts:
-                # Insert chunk context
-                chunk_context_id = insert_chunk_context(self.conn, entry_id, chunk_context.text, chunk_context.position)
-                for chunk in chunk_context.chunks:
-                    # Insert chunk
-                    chunk_id = insert_chunk(self.conn, chunk_context_id, chunk.text)
-                    # Create and insert embedding
-                    embedding = self.model.encode(chunk.text)
-                    insert_embedding(self.conn, chunk_id, embedding)
-        
+        stored_hashes = get_entry_hashes(self.conn)
+        current_hashes = {entry.name.lower(): self.content_hash(entry, chunker) for entry in raw_entries}
+
+        changed_entries = [entry for entry in raw_entries if stored_hashes.get(entry.name.lower()) != current_hashes[entry.name.lower()]]
+        removed_names = [name for name in stored_hashes if name not in current_hashes]
+
+        print(f"{len(changed_entries)} new or changed entries, {len(removed_names)} removed, "
+              f"{len(raw_entries) - len(changed_entries)} unchanged.")
+
+        try:
+            # Changed entries are deleted and inserted again
+            delete_entries(self.conn, removed_names + [entry.name for entry in changed_entries])
+            if changed_entries:
+                self._insert_chunked_entries(chunker.chunk_entries(changed_entries))
+                upsert_entry_hashes(self.conn, [(entry.name, current_hashes[entry.name.lower()]) for entry in changed_entries])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
         print("Processing complete.")
-        self.conn.commit()
         self.close()
 
+    def content_hash(self, entry: RawEntry, chunker: ContextChunkerInterface) -> str:
+        """Hash an entry's text together with the parameters used to chunk, embed and featurize it."""
+        featurizer_signature = self.context_featurizer.signature() if self.context_featurizer else ""
+        content = f"{self.model_name}\n{chunker.signature()}\n{featurizer_signature}\n{entry.text}"
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _insert_chunked_entries(self, chunked_entries: list[ChunkedEntry]):
+        """Embed and bulk insert chunked entries. The caller is responsible for committing."""
+        # Flatten every entry into rows with precomputed ids so they can be bulk inserted
+        entry_rows = []
+        chunk_context_rows = []
+        chunk_rows = []
+        entry_id = next_id(self.conn, 'entries')
+        chunk_context_id = next_id(self.conn, 'chunk_context')
+        chunk_id = next_id(self.conn, 'chunks')
+        for entry in chunked_entries:
+            entry_rows.append((entry_id, entry.name))
+            for chunk_context in entry.chunk_contexts:
+                chunk_context_rows.append((chunk_context_id, entry_id, chunk_context.text, chunk_context.position, self._features(chunk_context.text)))
+                for chunk in chunk_context.chunks:
+                    chunk_rows.append((chunk_id, chunk_context_id, chunk.text))
+                    chunk_id += 1
+                chunk_context_id += 1
+            entry_id += 1
+
+        print(f"Creating embeddings for {len(chunk_rows)} chunks from {len(entry_rows)} entries...")
+        embeddings = self.encode([text for _, _, text in chunk_rows])
+
+        print("Saving entries and embeddings...")
+        insert_entries(self.conn, entry_rows)
+        insert_chunk_contexts(self.conn, chunk_context_rows)
+        insert_chunks(self.conn, chunk_rows)
+        insert_embeddings(self.conn, [row[0] for row in chunk_rows], embeddings)
+
+    def _features(self, text) -> str | None:
+        """Features of a chunk context stored as a space separated string."""
+        if self.context_featurizer is None:
+            return None
+        return " ".join(sorted(self.context_featurizer.features(text)))
+
     def close(self):
         """Close database connection."""
-        self.conn.close()
\ No newline at end of file
+        self.conn.close()
@@ -0,0 +1,77 @@
+from pathlib import Path
+import numpy as np
+from utils.atomic_write import atomic_write
+from utils.ttl_cache import TTLCache
+
+class EmbeddingCache(TTLCache):
+    """Bounded LRU cache mapping normalized text to its embedding, optionally persisted to disk. Embeddings don't expire."""
+
+    def __init__(self, max_size=1024, model_name=None):
+        """
+        Args:
+            max_size: Maximum number of embeddings kept, least recently used are evicted first
+            model_name: Name of the model the embeddings came from, used to ignore stale cache files
+        """
+        super().__init__(max_size, ttl=None)
+        self.model_name = model_name
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # The embedding model is uncased and ignores extra whitespace, so this doesn't change the embedding
+        return " ".join(text.lower().split())
+
+    def get(self, text: str, default=None) -> np.ndarray | None:
+        return super().get(self.normalize(text), default)
+
+    def __contains__(self, text: str):
+        return super().__contains__(self.normalize(text))
+
+    def put(self, text: str, embedding: np.ndarray):
+        super().put(self.normalize(text), embedding)
+
+    def get_or_encode(self, text: str, encode) -> np.ndarray:
+        """Get the cached embedding for the text or create it with encode(normalized_text) and cache it."""
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = encode(self.normalize(text))
+            self.put(text, embedding)
+        return embedding
+
+    def get_or_encode_batch(self, texts: list[str], encode_batch) -> list[np.ndarray]:
+        """Like get_or_encode, but every missing text is encoded with a single encode_batch(list_of_texts) call."""
+        embeddings = [self.get(text) for text in texts]
+        missing = list(dict.fromkeys(self.normalize(text) for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            encoded = dict(zip(missing, encode_batch(missing)))
+            for text, embedding in encoded.items():
+                self.put(text, embedding)
+            embeddings = [embedding if embedding is not None else encoded[self.normalize(text)] for text, embedding in zip(texts, embeddings)]
+        return embeddings
+
+    def save(self, path):
+        """
+        Save the cache to a .npz file, least recently used first so the order survives a reload.
+        The file is replaced only once it's fully written, so a crash while saving leaves the previous cache.
+        """
+        items = self.items()
+        texts = [text for text, _ in items]
+        embeddings = np.stack([embedding for _, embedding in items]) if items else np.empty((0, 0), dtype=np.float32)
+        with atomic_write(path) as f:
+            np.savez(f, texts=np.array(texts, dtype=str), embeddings=embeddings, model_name=np.array(self.model_name or ""))
+
+    def load(self, path):
+        """Load a cache saved with save. Missing files or files from a different model are ignored."""
+        path = Path(path)
+        if not path.exists():
+            return
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["model_name"]) != (self.model_name or ""):
+                    return
+                texts = data["texts"].tolist()
+                embeddings = data["embeddings"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading embedding cache {path}: {e}")
+            return
+        for text, embedding in zip(texts, embeddings):
+            self.put(text, embedding)
@@ -0,0 +1,72 @@
+import sys
+import threading
+import time
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Process wide cache of sentence transformer models so every embedder and searcher shares one copy
+# Keyed on model_key so full precision and quantized copies of a model can coexist
+_models = {}
+_load_times: dict[str, float] = {}
+_lock = threading.Lock()
+# torch intra-op threads, None leaves torch's default of one thread per core
+_num_threads: int | None = None
+
+
+def model_key(model_name=DEFAULT_MODEL_NAME, quantize=False) -> str:
+    """Name identifying a model and its precision, embeddings from different keys shouldn't be mixed."""
+    return f"{model_name}:int8" if quantize else model_name
+
+
+def set_num_threads(num_threads: int | None):
+    """
+    Limit the threads torch uses within an operation, so several processes can share a machine.
+
+    Applied right away if torch is already imported, otherwise when get_model imports it.
+    """
+    global _num_threads
+    _num_threads = num_threads
+    if num_threads and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(num_threads)
+
+
+def get_model(model_name=DEFAULT_MODEL_NAME, quantize=False):
+    """
+    Get a sentence transformer model, loading it on first use.
+
+    Blocks if another thread is currently loading the model.
+
+    Args:
+        quantize: Replace the model's linear layers with dynamically quantized int8 ones for CPU inference
+    """
+    key = model_key(model_name, quantize)
+    with _lock:
+        if key not in _models:
+            start = time.perf_counter()
+            # Imported here because sentence_transformers pulls in torch and transformers, which is slow
+            import torch
+            from sentence_transformers import SentenceTransformer
+            if _num_threads:
+                torch.set_num_threads(_num_threads)
+            model = SentenceTransformer(model_name, device="cpu" if quantize else None)
+            if quantize:
+                torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            _models[key] = model
+            _load_times[key] = time.perf_counter() - start
+        return _models[key]
+
+
+def preload(model_name=DEFAULT_MODEL_NAME, quantize=False) -> threading.Thread:
+    """Load a model in a background thread so it's ready by the time it's needed."""
+    thread = threading.Thread(target=get_model, args=(model_name, quantize), name=f"preload-{model_key(model_name, quantize)}", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_loaded(model_name=DEFAULT_MODEL_NAME, quantize=False) -> bool:
+    return model_key(model_name, quantize) in _models
+
+
+def get_load_time(model_name=DEFAULT_MODEL_NAME, quantize=False) -> float | None:
+    """Seconds it took to load the model, or None if it hasn't been loaded."""
+    return _load_times.get(model_key(model_name, quantize))
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+import numpy as np
+from embeddings.data_classes import ChunkResult
+from .db_queries import get_all_embeddings
+from .db_setup import get_content_version, has_column
+from utils.atomic_write import atomic_write
+
+EMBEDDINGS_FILE = 'embeddings.npy'
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+
+
+class NumpyVectorIndex:
+    """
+    Read only in-memory vector index exported from the embeddings database.
+
+    All embeddings live in one contiguous, pre-normalized float32 matrix (memory mapped from a .npy file)
+    with the rows of each entry stored next to each other, so searching an entry is a single
+    slice and matrix-vector product.
+    """
+
+    def __init__(self, embeddings: np.ndarray, entry_ranges: dict[str, tuple[int, int]], rows: list[tuple], content_version=None):
+        """
+        Args:
+            embeddings: (n, dim) float32 matrix of unit length embeddings
+            entry_ranges: entry name -> (start, end) row range in the matrix
+            rows: (chunk context text, chunk text, position, features) of each matrix row
+            content_version: Content version of the database the index was exported from
+        """
+        self.embeddings = embeddings
+        self.entry_ranges = entry_ranges
+        self.rows = rows
+        self.content_version = content_version
+
+    @staticmethod
+    def export(conn, index_dir):
+        """Export every embedding in the database to an index directory."""
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+
+        db_rows = get_all_embeddings(conn, has_column(conn, 'chunk_context', 'features'))
+        entry_ranges = {}
+        rows = []
+        vectors = []
+        for i, (name, text, chunk_text, position, features, embedding) in enumerate(db_rows):
+            start, _ = entry_ranges.get(name, (i, i))
+            entry_ranges[name] = (start, i + 1)
+            rows.append((text, chunk_text, position, features))
+            vectors.append(np.frombuffer(embedding, dtype=np.float32))
+
+        embeddings = np.vstack(vectors).astype(np.float32) if vectors else np.empty((0, 0), dtype=np.float32)
+        # Normalize once here so a dot product is the cosine similarity
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+
+        # Replace the files rather than rewrite them, serving processes have the matrix memory mapped.
+        # The matrix goes first, a loader that pairs the new matrix with the old index.json sees the row count differ
+        with atomic_write(index_dir / EMBEDDINGS_FILE) as f:
+            np.save(f, np.ascontiguousarray(embeddings))
+        with atomic_write(index_dir / INDEX_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'content_version': get_content_version(conn),
+                'entry_ranges': entry_ranges,
+                'rows': rows
+            }, f)
+
+    @classmethod
+    def load(cls, index_dir, mmap=True):
+        """Load an exported index. Returns None if the directory doesn't contain a compatible index."""
+        index_dir = Path(index_dir)
+        if not (index_dir / EMBEDDINGS_FILE).exists() or not (index_dir / INDEX_FILE).exists():
+            return None
+        with open(index_dir / INDEX_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            return None
+        embeddings = np.load(index_dir / EMBEDDINGS_FILE, mmap_mode='r' if mmap else None)
+        rows = [tuple(row) for row in data['rows']]
+        if len(rows) != embeddings.shape[0]:
+            # caught between the two files of an export
+            return None
+        entry_ranges = {name: tuple(entry_range) for name, entry_range in data['entry_ranges'].items()}
+        return cls(embeddings, entry_ranges, rows, data.get('content_version'))
+
+    def search(self, query_embedding: np.ndarray, entry_name: str, top_k=5) -> list[ChunkResult]:
+        """Get the top_k chunks of an entry by cosine similarity, best first."""
+        start, end = self.entry_ranges.get(entry_name.lower(), (0, 0))
+        if start == end:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        similarities = self.embeddings[start:end] @ query
+
+        if top_k < len(similarities):
+            top = np.argpartition(-similarities, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(similarities))
+        top = top[np.argsort(-similarities[top], kind='stable')]
+
+        results = []
+        for i in top:
+            text, chunk_text, position, features = self.rows[start + i]
+            results.append(ChunkResult(
+                chunk_text=chunk_text,
+                chunk_context=text,
+                position=position,
+                similarity_score=float(similarities[i]),
+                features=frozenset(features.split()) if features is not None else None
+            ))
+        return results
+
+    def __len__(self):
+        return len(self.rows)
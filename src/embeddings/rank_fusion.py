@@ -0,0 +1,43 @@
+import re
+import numpy as np
+
+# Common words left out of full text queries, they match nearly every chunk
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its me my of on or s so that the this
+to what whats when where which who why will with you your
+""".split())
+
+
+def to_fts_query(text: str) -> str | None:
+    """Turn free text into an FTS5 query matching any of its words. Returns None if no words are left."""
+    words = [word for word in re.findall(r'\w+', text.lower()) if word not in STOPWORDS]
+    if not words:
+        return None
+    # Quote every word so FTS5 doesn't treat anything as syntax
+    return " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+
+
+def ranks(scores: np.ndarray) -> np.ndarray:
+    """1 based rank of each score, lower scores rank first. NaN scores are ranked after everything else."""
+    order = np.argsort(np.where(np.isnan(scores), np.inf, scores), kind='stable')
+    result = np.empty(len(scores), dtype=np.float64)
+    result[order] = np.arange(1, len(scores) + 1)
+    return result
+
+
+def reciprocal_rank_fusion(distances: np.ndarray, bm25_scores: np.ndarray, k=60) -> np.ndarray:
+    """
+    Fuse vector and keyword rankings with reciprocal rank fusion.
+
+    Args:
+        distances: Cosine distance of each row, lower is better
+        bm25_scores: SQLite bm25() score of each row, lower is better, NaN if the row didn't match
+        k: Smoothing constant, larger values flatten the difference between top ranks
+
+    Returns:
+        Fused score of each row, higher is better
+    """
+    fused = 1.0 / (k + ranks(distances))
+    matched = ~np.isnan(bm25_scores)
+    fused[matched] += 1.0 / (k + ranks(bm25_scores[matched]))
+    return fused
@@ -1,16 +1,9 @@
 import re
 import math
-import nltk
 from nltk.tokenize import sent_tokenize
 from .data_classes import RawEntry, ChunkedEntry, Chunk, ChunkContext
 from embeddings.context_chunker_interface import ContextChunkerInterface
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
 class SentenceChunker(ContextChunkerInterface):
     def __init__(self, chunk_size=10):
         """Initialize the chunker with a specific chunk size."""
@@ -19,6 +12,9 @@ class SentenceChunker(ContextChunkerInterface):
             raise ValueError("Target chunk size must be greater than 4.")
         self.chunk_size = chunk_size
 
+    def signature(self) -> str:
+        return f"{type(self).__name__}(chunk_size={self.chunk_size})"
+
     def chunk_entries(self, raw_entries: list[RawEntry]) -> list[ChunkedEntry]:
         """Process a text for an entry with chunking."""
         chunked_entries = []
@@ -1,37 +1,235 @@
-from embeddings.data_classes import ChunkResult
-from .db_queries import get_embeddings_for_entry
-from .embedder import Embedder
+from pathlib import Path
+import numpy as np
+from embeddings.data_classes import ChunkResult, EntryResult
+from . import model_registry
+from .embedding_cache import EmbeddingCache
+from .db_queries import get_embeddings_for_entry, get_hybrid_scores_for_entry, get_nearest_chunks
+from .db_setup import connect, has_column, has_table, get_content_version, get_metadata
+from .numpy_index import NumpyVectorIndex, INDEX_FILE
+from .rank_fusion import reciprocal_rank_fusion, to_fts_query
+
+SEARCH_MODES = ("vector", "hybrid")
+# sqlite-vec's upper limit for k in KNN queries
+MAX_KNN_K = 4096
 
 class VectorSearcher:
-    def __init__(self, db_path):
-        """Initialize the spell searcher."""
-        self.embedder = Embedder(db_path)
-    
-    def search(self, query, entry_name, top_k=5):
+    def __init__(self, db_path, model_name=model_registry.DEFAULT_MODEL_NAME, cache_size=1024, cache_path=None, index_dir=None, quantize=False):
+        """
+        Initialize the spell searcher.
+
+        The embedding model is shared across the process and only loaded on the first search
+        (or when preload is called).
+
+        Args:
+            db_path: Path to SQLite database
+            model_name: Sentence transformer model name
+            cache_size: Maximum number of query embeddings to cache
+            cache_path: Optional .npz file the query cache is loaded from and saved to on close
+            index_dir: Optional NumpyVectorIndex directory, vector searches within an entry use it instead of sqlite-vec
+            quantize: Encode queries with a dynamically quantized int8 copy of the model, see model_registry.get_model
+        """
+        self.db_path = db_path
+        self.model_name = model_name
+        self.quantize = quantize
+        # Searches can run on a server's worker threads. Python's sqlite3 is built serialized (threadsafety 3),
+        # so one connection can be shared between them
+        self.conn = connect(self.db_path, check_same_thread=False)
+        self.has_context_features = has_column(self.conn, 'chunk_context', 'features')
+        self.has_keyword_index = has_table(self.conn, 'chunks_fts')
+        # search_entries turns KNN distances into similarities, which only works for cosine distances.
+        # Databases built before the metric was recorded use L2, search_entries finds nothing until they're rebuilt
+        self.has_cosine_distance = get_metadata(self.conn, 'distance_metric') == 'cosine'
+        if not self.has_cosine_distance:
+            print("The embeddings database doesn't use cosine distance, searching across entries is disabled. Rebuild it by running train.py")
+
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.index = None
+        # (database version, index file modification time) the index was last checked against
+        self._index_checked_at = None
+        self._refresh_index()
+
+        self.cache_path = cache_path
+        # quantized query embeddings differ slightly, so a cache saved at the other precision is ignored
+        self.query_cache = EmbeddingCache(cache_size, model_registry.model_key(model_name, quantize))
+        if cache_path:
+            self.query_cache.load(cache_path)
+
+    @property
+    def model(self):
+        return model_registry.get_model(self.model_name, self.quantize)
+
+    def preload(self):
+        """Start loading the embedding model in the background."""
+        if not model_registry.is_loaded(self.model_name, self.quantize):
+            model_registry.preload(self.model_name, self.quantize)
+
+    def load_model(self):
+        """Load the embedding model now, or wait for a load already started by preload to finish."""
+        model_registry.get_model(self.model_name, self.quantize)
+
+    def db_version(self) -> int:
+        """Counter that changes whenever another connection (e.g. the trainer) commits to the database."""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _refresh_index(self):
+        """
+        Make sure the index matches the database, checked again whenever the database or the index file changes.
+
+        A retrain commits to the database and then exports the index, so a long running process picks up the
+        new index, or searches the database until it's exported.
+        """
+        if self.index_dir is None:
+            return
+        index_file = self.index_dir / INDEX_FILE
+        checked_at = (self.db_version(), index_file.stat().st_mtime_ns if index_file.exists() else None)
+        if checked_at == self._index_checked_at:
+            return
+        first_check = self._index_checked_at is None
+        self._index_checked_at = checked_at
+
+        content_version = get_content_version(self.conn)
+        if self.index is not None and self.index.content_version == content_version:
+            return
+        index = NumpyVectorIndex.load(self.index_dir)
+        if index is not None and index.content_version == content_version:
+            self.index = index
+        else:
+            self.index = None
+            if first_check:
+                print(f"Vector index in {self.index_dir} is missing or out of date, searching the database instead.")
+
+    def encode_query(self, query):
+        """Embed a query, reusing the cached embedding for repeated queries."""
+        # The model is only fetched on a miss so cache hits never wait for it to load
+        return self.query_cache.get_or_encode(query, lambda text: self.model.encode(text))
+
+    def encode_queries(self, queries: list[str]):
+        """Embed several queries, every query missing from the cache is encoded in a single batch."""
+        return self.query_cache.get_or_encode_batch(queries, lambda texts: list(self.model.encode(texts)))
+
+    def search_batch(self, queries: list[str], entry_names: list[str], top_k=5, mode="vector"):
+        """Search several queries, each within its own entry. Returns a list of results per query."""
+        if len(queries) != len(entry_names):
+            raise ValueError("Each query needs an entry name.")
+        query_embeddings = self.encode_queries(queries)
+        return [
+            self.search(query, entry_name, top_k, mode, query_embedding)
+            for query, entry_name, query_embedding in zip(queries, entry_names, query_embeddings)
+        ]
+
+    def search(self, query, entry_name, top_k=5, mode="vector", query_embedding=None):
         """
         Search for relevant context in entries.
-        
+
         Args:
             query: User query
             entry_name: Optional specific entry name
             top_k: Number of top results to return
-        
+            mode: "vector" ranks by cosine similarity, "hybrid" fuses it with BM25 keyword ranking
+            query_embedding: Embedding of the query if it's already been encoded
+
         Returns:
-            List of tuples (sentence_text, sentence_order, similarity_score)
+            List of ChunkResults, best first
         """
         if not entry_name:
             raise ValueError("An entry name must be provided for search.")
-        
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}.")
+
         # Create query embedding
-        query_embedding = self.embedder.model.encode(query)
-                
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
+
+        fts_query = to_fts_query(query) if mode == "hybrid" else None
+        # Without keywords to match (or an index to match them in) hybrid search is just vector search
+        if mode == "hybrid" and fts_query and self.has_keyword_index:
+            return self._hybrid_search(query_embedding, fts_query, entry_name, top_k)
+
+        self._refresh_index()
+        if self.index is not None:
+            return self.index.search(query_embedding, entry_name, top_k)
+
         # Search within specific entry
-        results = get_embeddings_for_entry(self.embedder.conn, query_embedding, entry_name, top_k)
+        results = get_embeddings_for_entry(self.conn, query_embedding, entry_name, top_k, self.has_context_features)
 
         # Convert to similarity scores
-        similarity_results = [ChunkResult(chunk_text=chunk_text, chunk_context=text, position=position, similarity_score=1 - distance) for text, chunk_text, position, distance in results]
+        similarity_results = [
+            ChunkResult(
+                chunk_text=chunk_text,
+                chunk_context=text,
+                position=position,
+                similarity_score=1 - distance,
+                features=frozenset(features.split()) if features is not None else None
+            )
+            for text, chunk_text, position, distance, features in results
+        ]
         return similarity_results
-    
+
+    def search_entries(self, query, top_n=5, chunks_per_entry=2, oversample=10):
+        """
+        Search across every entry and return the best matching entries.
+
+        Uses the vec0 KNN index instead of scanning every embedding, so it stays fast as entries are added.
+
+        Args:
+            query: User query
+            top_n: Number of entries to return
+            chunks_per_entry: Number of supporting chunks (with distinct contexts) to keep per entry
+            oversample: Nearest chunks fetched per requested entry, several chunks usually come from the same entry
+
+        Returns:
+            List of EntryResults, best first, empty if the database doesn't use cosine distance
+        """
+        if not self.has_cosine_distance:
+            return []
+        query_embedding = self.encode_query(query)
+        k = min(top_n * oversample, MAX_KNN_K)
+        rows = get_nearest_chunks(self.conn, query_embedding, k, self.has_context_features)
+
+        # Rows come back nearest first so the first chunk seen for an entry is its best
+        entries: dict[str, EntryResult] = {}
+        for name, text, chunk_text, position, distance, features in rows:
+            entry = entries.get(name)
+            if entry is None:
+                if len(entries) >= top_n:
+                    continue
+                entry = entries[name] = EntryResult(name=name, similarity_score=1 - distance, chunks=[])
+            if len(entry.chunks) < chunks_per_entry and all(chunk.chunk_context != text for chunk in entry.chunks):
+                entry.chunks.append(ChunkResult(
+                    chunk_text=chunk_text,
+                    chunk_context=text,
+                    position=position,
+                    similarity_score=1 - distance,
+                    features=frozenset(features.split()) if features is not None else None
+                ))
+        return list(entries.values())
+
+    def _hybrid_search(self, query_embedding, fts_query, entry_name, top_k):
+        """Score every chunk of the entry by vector and keyword in one query and fuse the rankings."""
+        rows = get_hybrid_scores_for_entry(self.conn, query_embedding, fts_query, entry_name, self.has_context_features)
+        if not rows:
+            return []
+
+        distances = np.array([row[3] for row in rows], dtype=np.float64)
+        bm25_scores = np.array([np.nan if row[5] is None else row[5] for row in rows], dtype=np.float64)
+        fused = reciprocal_rank_fusion(distances, bm25_scores)
+
+        results = []
+        for i in np.argsort(-fused, kind='stable')[:top_k]:
+            text, chunk_text, position, distance, features, bm25 = rows[i]
+            results.append(ChunkResult(
+                chunk_text=chunk_text,
+                chunk_context=text,
+                position=position,
+                similarity_score=1 - distance,
+                features=frozenset(features.split()) if features is not None else None,
+                keyword_score=-bm25 if bm25 is not None else 0.0,
+                fused_score=float(fused[i])
+            ))
+        return results
+
     def close(self):
-        """Close database connection."""
-        self.embedder.close()
\ No newline at end of file
+        """Close database connection and persist the query cache."""
+        if self.cache_path:
+            self.query_cache.save(self.cache_path)
+        self.conn.close()
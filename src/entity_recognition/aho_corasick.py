@@ -0,0 +1,63 @@
+from collections import deque
+
+class AhoCorasickMatcher:
+    """
+    Aho-Corasick automaton finding every occurrence of a set of patterns in one pass over the text.
+
+    Patterns are added with a value that's returned with each match. Call build once all patterns are added.
+    """
+
+    def __init__(self):
+        # node -> {character -> next node}, node 0 is the root
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # node -> (pattern length, value) of the patterns ending exactly at the node
+        self._terminal: list[list[tuple[int, object]]] = [[]]
+        # same as _terminal but including patterns reached through fail links, filled in by build
+        self._output: list[list[tuple[int, object]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value):
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append([])
+            node = next_node
+        self._terminal[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """Compute the fail links breadth first."""
+        self._output = [list(terminal) for terminal in self._terminal]
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._output[next_node].extend(self._output[self._fail[next_node]])
+        self._built = True
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, value) for every pattern occurrence in the text, ordered by end position."""
+        if not self._built:
+            self.build()
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._output[node]:
+                yield i + 1 - length, i + 1, value
@@ -6,3 +6,6 @@ class Prediction:
     label: str
     value: str
     confidence: float
+    # character span of an exact match in the text, None for fuzzy matches
+    start: int | None = None
+    end: int | None = None
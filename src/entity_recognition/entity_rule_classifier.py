@@ -1,9 +1,12 @@
-from spacy import Language
-import spacy
+from typing import TYPE_CHECKING
 import json
 from .data_classes import Prediction
 from .interfaces.classifier_interface import ClassifierInterface
 
+# spaCy is slow to import and only needed by this classifier, so it's imported when used
+if TYPE_CHECKING:
+    from spacy import Language
+
 # This was an attempt to use spaCy's EntityRuler for rule-based entity recognition
 # TODO: This code is not thoroughly tested, and may not work with the latest interfaces
 # Uses spaCy's EntityRuler to create a rule-based entity recognition model
@@ -11,12 +14,13 @@ from .interfaces.classifier_interface import ClassifierInterface
 # This does not support fuzzy matching
 # For larger data sets or more complex patterns, consider using a more advanced recognition method
 class EntityRuleClassifier(ClassifierInterface):
-    def __init__(self, nlp: Language):
+    def __init__(self, nlp: "Language"):
         self.nlp = nlp
 
     @staticmethod
     def build_model (entity_label_data_path):
         """Build a spaCy NER model using the entity ruler component."""
+        import spacy
         nlp = spacy.blank("en")
         # Add the entity ruler component using the string name
         ruler = nlp.add_pipe("entity_ruler")
@@ -57,6 +61,7 @@ class EntityRuleClassifier(ClassifierInterface):
 
     @classmethod
     def load(cls, entity_classifier_path: str):
+        import spacy
         try:
             instance = cls(spacy.load(entity_classifier_path))
             return instance
@@ -1,37 +1,200 @@
 import json
+import math
+import numpy as np
 
 from entity_recognition.data_classes import Prediction
+from .aho_corasick import AhoCorasickMatcher
 from .interfaces.classifier_interface import ClassifierInterface
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+
+
+def _bigrams(text):
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+class _LabelPatterns:
+    """Patterns of one label, normalized once, with a bigram index used to prune fuzzy match candidates."""
+
+    def __init__(self, label, patterns, min_score):
+        self.label = label
+        self.patterns = patterns
+        self.normalized = [pattern.lower() for pattern in patterns]
+        self.lengths = np.array([len(pattern) for pattern in self.normalized])
+
+        # bigram -> (pattern indices, number of times the bigram appears in each pattern)
+        postings: dict[str, dict[int, int]] = {}
+        for i, pattern in enumerate(self.normalized):
+            for bigram in _bigrams(pattern):
+                counts = postings.setdefault(bigram, {})
+                counts[i] = counts.get(i, 0) + 1
+        self.postings = {
+            bigram: (np.fromiter(counts.keys(), dtype=np.intp), np.fromiter(counts.values(), dtype=np.float64))
+            for bigram, counts in postings.items()
+        }
+
+        # Minimum number of a pattern's bigrams that must appear in the text for it to possibly score min_score
+        # partial_ratio compares the pattern (length m) with windows of at most m characters, so reaching min_score
+        # needs an indel distance of at most 2m(1 - min_score/100). The edit distance is at most the indel distance
+        # and each edit removes at most 2 of the pattern's m - 1 bigrams (q-gram lemma)
+        self.required_bigrams = np.array([
+            max(0, (m - 1) - 2 * math.floor(2 * m * (1 - min_score / 100))) for m in self.lengths
+        ])
+
+    def candidates(self, text_bigrams, text_length) -> np.ndarray:
+        """Indices of the patterns that share enough bigrams with the text to reach the minimum score, in pattern order."""
+        matches = [self.postings[bigram] for bigram in text_bigrams if bigram in self.postings]
+        if matches:
+            indices = np.concatenate([match[0] for match in matches])
+            weights = np.concatenate([match[1] for match in matches])
+            counts = np.bincount(indices, weights=weights, minlength=len(self.patterns))
+        else:
+            counts = np.zeros(len(self.patterns))
+        # The bound only holds when the pattern is the shorter string, longer patterns are always checked
+        return np.flatnonzero((counts >= self.required_bigrams) | (self.lengths > text_length))
+
 
 # Finds the best fuzzy match from a list of patterns for each entity label greater than a minimum score
-# IMPORTANT: This only works for relatively small data sets with predictable patterns
-# For larger data sets or more complex patterns, consider using a more advanced recognition method
+# Patterns are normalized once on load and each label is scored in a single batched rapidfuzz call.
+# With a min_score, patterns that can't reach it are pruned with a bigram index before scoring.
+# With exact_match, whole word occurrences of the patterns are found first with an Aho-Corasick automaton
+# and only labels without an exact hit are fuzzy matched.
 class SingleFuzzyClassifier(ClassifierInterface):
-    def __init__(self, entity_classifier_path):
+    def __init__(self, entity_classifier_path, min_score=0, exact_match=False, workers=1):
+        """
+        Args:
+            entity_classifier_path: Path to the entity label data
+            min_score: Labels whose best match scores below this aren't returned, 0 returns every label
+            exact_match: Look for exact whole word matches before falling back to fuzzy matching
+            workers: Threads predict_batch scores a label with, -1 uses every core
+        """
         with open(entity_classifier_path, 'r') as f:
             data = json.load(f)
             self.entities = data["entities"]
 
+        self.min_score = min_score
+        self.workers = workers
+        self.label_patterns = [_LabelPatterns(entity["label"], entity["patterns"], min_score) for entity in self.entities]
+
+        self.exact_match = exact_match
+        self.matcher = AhoCorasickMatcher()
+        if exact_match:
+            for label_index, label_patterns in enumerate(self.label_patterns):
+                for pattern_index, pattern in enumerate(label_patterns.normalized):
+                    self.matcher.add(pattern, (label_index, pattern_index))
+            self.matcher.build()
+
     def _extract_key_value(self, text, label):
         """Extract the key part from matched entities based on label type"""
         return text  # Default implementation, can be overridden in subclasses
 
+    def _exact_matches(self, text_lower) -> dict[int, list[tuple[int, int, int]]]:
+        """
+        Find whole word pattern occurrences in one pass over the text.
+
+        Returns:
+            Label index -> (start, end, pattern index) of its matches in text order.
+            Within a label matches don't overlap, the leftmost and then longest match wins.
+        """
+        matches: dict[int, list[tuple[int, int, int]]] = {}
+        for start, end, (label_index, pattern_index) in self.matcher.iter_matches(text_lower):
+            # skip matches inside a word e.g. "fire" in "fireball"
+            if (start > 0 and text_lower[start - 1].isalnum()) or (end < len(text_lower) and text_lower[end].isalnum()):
+                continue
+            matches.setdefault(label_index, []).append((start, end, pattern_index))
+
+        for label_index, spans in matches.items():
+            spans.sort(key=lambda span: (span[0], span[0] - span[1]))
+            selected = []
+            for span in spans:
+                if not selected or span[0] >= selected[-1][1]:
+                    selected.append(span)
+            matches[label_index] = selected
+        return matches
+
+    def _fuzzy_match(self, label_patterns, text_lower, text_bigrams) -> Prediction | None:
+        """Find the best fuzzy match of a label, None if nothing reaches the minimum score."""
+        if text_bigrams is not None:
+            indices = label_patterns.candidates(text_bigrams, len(text_lower))
+            choices = [label_patterns.normalized[i] for i in indices]
+        else:
+            indices = None
+            choices = label_patterns.normalized
+
+        # First pattern with the best score wins, stops early on a perfect match
+        match = process.extractOne(text_lower, choices, scorer=fuzz.partial_ratio, score_cutoff=self.min_score)
+        if match is None:
+            return None
+
+        _, score, choice_index = match
+        pattern_index = indices[choice_index] if indices is not None else choice_index
+        parsed_value = self._extract_key_value(label_patterns.patterns[pattern_index], label_patterns.label)
+        return Prediction(label=label_patterns.label, value=parsed_value, confidence=score)
+
+    def _predict(self, text, all_exact_matches):
+        text_lower = text.lower()
+        exact_matches = self._exact_matches(text_lower) if self.exact_match else {}
+        # Pruning is only safe for a minimum score, and short texts have too few bigrams to prune with
+        prune = self.min_score > 0 and len(text_lower) >= 3
+        text_bigrams = set(_bigrams(text_lower)) if prune else None
 
-    def predict(self, text):
-        """Predict the class of the given text."""
         predicted_entities = []
-        for entity in self.entities:
-            best_score = 0
-            for pattern in entity["patterns"]:
-                score = fuzz.partial_ratio(pattern.lower(), text.lower())
-                
-                if score > best_score:
-                    best_score = score
-                    label = entity["label"]
-                    value = pattern
-                if best_score == 100:
-                    break
-            parsed_value = self._extract_key_value(value, label)
-            predicted_entities.append(Prediction(label=label, value=parsed_value, confidence=best_score))
-        return predicted_entities
\ No newline at end of file
+        for label_index, label_patterns in enumerate(self.label_patterns):
+            spans = exact_matches.get(label_index)
+            if spans:
+                for start, end, pattern_index in (spans if all_exact_matches else spans[:1]):
+                    parsed_value = self._extract_key_value(label_patterns.patterns[pattern_index], label_patterns.label)
+                    predicted_entities.append(Prediction(label_patterns.label, parsed_value, 100.0, start, end))
+                continue
+
+            prediction = self._fuzzy_match(label_patterns, text_lower, text_bigrams)
+            if prediction is not None:
+                predicted_entities.append(prediction)
+        return predicted_entities
+
+    def predict(self, text):
+        """Predict the class of the given text. Returns the best match of each label, exact matches first."""
+        return self._predict(text, all_exact_matches=False)
+
+    def predict_all(self, text):
+        """
+        Like predict, but returns every exact match of a label in text order e.g. both spells in
+        "fireball vs lightning bolt". Labels without an exact match still get their best fuzzy match.
+        """
+        return self._predict(text, all_exact_matches=True)
+
+    def predict_batch(self, texts: list[str]) -> list[list[Prediction]]:
+        """
+        Predict several texts at once, returns the same predictions as calling predict on each.
+
+        Without a minimum score every text is fuzzy matched against all of a label's patterns,
+        so each label is scored for the whole batch with one rapidfuzz cdist call on workers threads.
+        """
+        # Pruned candidates differ per text so there's nothing to share between them
+        if self.min_score > 0:
+            return [self.predict(text) for text in texts]
+
+        texts_lower = [text.lower() for text in texts]
+        exact_matches = [self._exact_matches(text_lower) if self.exact_match else {} for text_lower in texts_lower]
+
+        batch_predictions: list[list[Prediction]] = [[] for _ in texts]
+        for label_index, label_patterns in enumerate(self.label_patterns):
+            fuzzy_rows = []
+            for row, spans in enumerate(exact_matches):
+                spans = spans.get(label_index)
+                if spans:
+                    start, end, pattern_index = spans[0]
+                    parsed_value = self._extract_key_value(label_patterns.patterns[pattern_index], label_patterns.label)
+                    batch_predictions[row].append(Prediction(label_patterns.label, parsed_value, 100.0, start, end))
+                else:
+                    fuzzy_rows.append(row)
+
+            if not fuzzy_rows or not label_patterns.normalized:
+                continue
+
+            scores = process.cdist([texts_lower[row] for row in fuzzy_rows], label_patterns.normalized, scorer=fuzz.partial_ratio, dtype=np.float64, workers=self.workers)
+            # argmax picks the first best pattern like extractOne
+            best_indices = scores.argmax(axis=1)
+            for row, pattern_index, score in zip(fuzzy_rows, best_indices, scores[np.arange(len(fuzzy_rows)), best_indices]):
+                parsed_value = self._extract_key_value(label_patterns.patterns[pattern_index], label_patterns.label)
+                batch_predictions[row].append(Prediction(label=label_patterns.label, value=parsed_value, confidence=float(score)))
+        return batch_predictions
@@ -1,2 +1,8 @@
 from .assistant import Assistant
-from .trainer import Trainer
\ No newline at end of file
+
+def __getattr__(name):
+    # The trainer needs torch, import it on first use so the chatbot can run on NumPy inference alone
+    if name == "Trainer":
+        from .trainer import Trainer
+        return Trainer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
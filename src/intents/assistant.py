@@ -1,7 +1,8 @@
 import random
 
-import torch
-import torch.nn.functional as F
+import numpy as np
+from .exception_log import ExceptionLog
+from .models.numpy_intent_classifier import NumpyIntentClassifier
 from .utils.data_preprocessor import DataPreprocessor
 from utils.colors import YELLOW, RESET
 
@@ -9,27 +10,64 @@ class Assistant:
     def __init__(self, model, exceptions_path):
         self.model_data = model
         self.exceptions_path = exceptions_path
+        self.exception_log = ExceptionLog(exceptions_path)
         self.debug = False
 
-    def write_exception(self, input_message, predicted_tag, confidence):
-        with open(self.exceptions_path, "a") as f:
-            f.write(f"Message: {input_message}, Predicted Tag: {predicted_tag}, Confidence: {confidence}\n")
+    def write_exception(self, input_message, predicted_tag, confidence, entities: dict[str, str] | None = None, latency: float | None = None):
+        """Log a message that couldn't be answered, it's written to the exceptions log in the background."""
+        self.exception_log.record(input_message, predicted_tag, confidence, entities, latency)
 
-    def process_message(self, input_message) -> tuple[str | None, str]:
-        words = DataPreprocessor.tokenize_and_lemmatize(input_message)
-        bag = DataPreprocessor.bag_of_words(words, self.model_data.vocabulary)
+    def close(self):
+        self.exception_log.close()
 
-        bag_tensor = torch.tensor([bag], dtype=torch.float32)
-        self.model_data.intent_classifier.eval()
-        with torch.no_grad():
-            logits = self.model_data.intent_classifier(bag_tensor)
-            probabilities = F.softmax(logits, dim=1)
-            confidence = torch.max(probabilities).item()
-        
-        predicted_class_index = torch.argmax(probabilities, dim=1).item()
-        predicted_intent = self.model_data.intents[predicted_class_index]
+    def process_message(self, input_message) -> tuple[str | None, str, float]:
+        return self.respond(*self.classify(input_message))
+
+    def classify(self, input_message) -> tuple[str, float]:
+        return self.classify_batch([input_message])[0]
+
+    def process_batch(self, input_messages: list[str]) -> list[tuple[str | None, str, float]]:
+        """
+        Classify several messages with a single forward pass of the intent classifier.
+
+        Returns:
+            (predicted intent, response, confidence) for each message, in order
+        """
+        return [self.respond(predicted_intent, confidence) for predicted_intent, confidence in self.classify_batch(input_messages)]
+
+    def classify_batch(self, input_messages: list[str]) -> list[tuple[str, float]]:
+        """Most likely intent and its probability for each message, however low the probability."""
+        if not input_messages:
+            return []
 
+        bags = DataPreprocessor.bags_of_words(
+            [DataPreprocessor.tokenize_and_lemmatize(input_message) for input_message in input_messages],
+            self.model_data.vocabulary_index
+        )
+
+        probabilities = self.predict_probabilities(bags)
+        predicted_class_indices = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(probabilities)), predicted_class_indices]
+
+        return [
+            (self.model_data.intents[predicted_class_index], confidence)
+            for predicted_class_index, confidence in zip(predicted_class_indices.tolist(), confidences.tolist())
+        ]
+
+    def predict_probabilities(self, bags: np.ndarray) -> np.ndarray:
+        """Intent probabilities for each row of bags, torch is only imported for a torch model."""
+        intent_classifier = self.model_data.intent_classifier
+        if isinstance(intent_classifier, NumpyIntentClassifier):
+            return intent_classifier.predict_proba(bags)
+
+        import torch
+        import torch.nn.functional as F
+        intent_classifier.eval()
+        with torch.no_grad():
+            logits = intent_classifier(torch.from_numpy(bags))
+            return F.softmax(logits, dim=1).numpy()
 
+    def respond(self, predicted_intent, confidence) -> tuple[str | None, str, float]:
         # Only respond if confidence is high enough
         if confidence < 0.8 or predicted_intent == "none":
             return (None, "", confidence)
@@ -0,0 +1,11 @@
+from dataclasses import dataclass, field
+
+@dataclass
+class CandidatePattern:
+    # message with its entities replaced by the placeholders intents.json uses, e.g. "What is the range of {name}?"
+    pattern: str
+    # intent the classifier leaned towards most often for these messages, None if it never predicted one
+    tag: str | None
+    count: int
+    mean_confidence: float
+    examples: list[str] = field(default_factory=list)
@@ -0,0 +1,197 @@
+"""
+JSON lines log of the messages the chatbot couldn't answer, written in batches by a background thread
+"""
+import atexit
+import json
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Lines of the plain text log written before this one
+_LEGACY_LINE = re.compile(r"Message: (?P<message>.*), Predicted Tag: (?P<predicted_tag>.*), Confidence: (?P<confidence>[\d.e-]+)$")
+
+class ExceptionLog:
+    """
+    Buffers records in memory and appends them to a JSON lines file from a background thread, one write per batch.
+
+    The file is rotated before a record would grow it past max_bytes: exceptions.jsonl becomes exceptions.jsonl.1,
+    exceptions.jsonl.1 becomes exceptions.jsonl.2 and so on, keeping at most backup_count old files.
+    While the file can't be written, records wait in memory up to max_pending, then the oldest are dropped and counted.
+    """
+
+    def __init__(self, path, max_bytes=1_000_000, backup_count=3, flush_interval=1.0, max_buffer=256, max_pending=10_000):
+        """
+        Args:
+            path: JSON lines file to append to
+            max_bytes: Size the file is rotated at, 0 to never rotate
+            backup_count: Rotated files kept, 0 starts the file over instead
+            flush_interval: Seconds a record waits in memory at most before it's written
+            max_buffer: Buffered records that trigger a write before flush_interval is up
+            max_pending: Buffered records kept at most when writes fail
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_pending = max_pending
+        # records dropped because the buffer was full
+        self.dropped = 0
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        # Held while writing so a flush from the caller's thread doesn't interleave with the background one
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._failing = False
+
+    def record(self, message, predicted_tag, confidence, entities: dict[str, str] | None = None, latency: float | None = None):
+        """
+        Queue a message that couldn't be answered.
+
+        Args:
+            predicted_tag: Most likely intent even though its confidence was too low to answer with
+            entities: Entity label -> value known when the message was answered
+            latency: Seconds spent on the turn
+        """
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "message": message,
+            "predicted_tag": predicted_tag,
+            "confidence": float(confidence),
+            "entities": entities or {},
+            "latency": latency,
+        }
+        with self._lock:
+            if self._closed:
+                raise ValueError("Exception log is closed.")
+            self._buffer.append(entry)
+            self._trim_buffer()
+            if self._thread is None:
+                # Started on the first record so an Assistant that never misses doesn't cost a thread
+                self._thread = threading.Thread(target=self._flush_periodically, name="exception-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            if len(self._buffer) >= self.max_buffer:
+                self._wake.set()
+
+    def flush(self):
+        """Write the buffered records now. Raises OSError if they can't be written, they're kept for the next flush."""
+        with self._write_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+
+            lines = [(json.dumps(entry) + "\n").encode('utf-8') for entry in entries]
+            try:
+                self._write(lines)
+            except OSError:
+                with self._lock:
+                    # _write removes the lines it wrote, the rest go back in front of the records that came since
+                    self._buffer[:0] = entries[len(entries) - len(lines):]
+                    self._trim_buffer()
+                raise
+
+    def close(self):
+        """Stop the background thread and write what's left, called at exit if not called before."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+            atexit.unregister(self.close)
+        self._flush_and_report()
+
+    def files(self) -> list[Path]:
+        """The log files that exist, oldest first."""
+        rotated = [self.rotated_path(i) for i in range(self.backup_count, 0, -1)]
+        return [path for path in (*rotated, self.path) if path.exists()]
+
+    def rotated_path(self, i: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{i}")
+
+    def _write(self, lines: list[bytes]):
+        """Append the lines, rotating the file between them so it stays within max_bytes. Written lines are removed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = self.path.stat().st_size if self.path.exists() else 0
+        while lines:
+            count, chunk_size = 0, 0
+            for line in lines:
+                # a record longer than max_bytes is still written, to a file of its own
+                if self.max_bytes and size + chunk_size + len(line) > self.max_bytes and (size or count):
+                    break
+                count += 1
+                chunk_size += len(line)
+            if count:
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(lines[:count]))
+                del lines[:count]
+                size += chunk_size
+            if lines:
+                self._rotate()
+                size = 0
+
+    def _trim_buffer(self):
+        overflow = len(self._buffer) - self.max_pending
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+
+    def _flush_and_report(self):
+        try:
+            self.flush()
+        except OSError as e:
+            # Reported once until a write succeeds again rather than on every retry
+            if not self._failing:
+                print(f"Couldn't write the exceptions log {self.path}: {e}. Records are kept in memory "
+                      f"until it can be written, up to {self.max_pending}, then the oldest are dropped.")
+            self._failing = True
+        else:
+            if self._failing:
+                print(f"Writing the exceptions log {self.path} again, {self.dropped} records were dropped.")
+            self._failing = False
+
+    def _rotate(self):
+        if self.backup_count == 0:
+            self.path.unlink()
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            if self.rotated_path(i).exists():
+                self.rotated_path(i).replace(self.rotated_path(i + 1))
+        self.path.replace(self.rotated_path(1))
+
+    def _flush_periodically(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush_and_report()
+
+
+def read_exception_log(paths) -> list[dict]:
+    """Read the records of exception logs, lines in the old plain text format are read too and others are skipped."""
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if legacy := _LEGACY_LINE.match(line):
+                    records.append({
+                        "message": legacy["message"],
+                        "predicted_tag": None if legacy["predicted_tag"] == "None" else legacy["predicted_tag"],
+                        "confidence": float(legacy["confidence"]),
+                        "entities": {},
+                    })
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and isinstance(record.get("message"), str):
+                    records.append(record)
+    return records
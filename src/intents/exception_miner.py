@@ -0,0 +1,87 @@
+"""
+Turn the messages of the exceptions log into candidate intents.json patterns, most frequent first
+"""
+import re
+from collections import Counter, defaultdict
+from .data_classes import CandidatePattern
+
+# Placeholder used in intents.json patterns for each entity label, labels not listed use DEFAULT_PLACEHOLDER
+ENTITY_PLACEHOLDERS = {"SPELL": "{name}"}
+DEFAULT_PLACEHOLDER = "{criteria}"
+
+
+def to_pattern(message: str, entities: dict[str, str]) -> str:
+    """Replace the entity values in a message with their placeholders."""
+    # longest values first so "fire bolt" isn't cut short by "fire"
+    for label, value in sorted(entities.items(), key=lambda entity: len(entity[1]), reverse=True):
+        if value:
+            placeholder = ENTITY_PLACEHOLDERS.get(label, DEFAULT_PLACEHOLDER)
+            message = re.sub(rf"\b{re.escape(value)}\b", placeholder, message, flags=re.IGNORECASE)
+    return message.strip()
+
+
+def entity_matcher(entity_patterns: dict[str, list[str]]) -> tuple[re.Pattern, dict[str, str]]:
+    """One regex matching any known entity value, with the placeholder for each lowercased value."""
+    placeholders = {
+        value.lower(): ENTITY_PLACEHOLDERS.get(label, DEFAULT_PLACEHOLDER)
+        for label, values in entity_patterns.items() for value in values
+    }
+    # longest values first, the regex takes the first alternative that matches
+    values = sorted(placeholders, key=len, reverse=True)
+    return re.compile(rf"\b(?:{'|'.join(map(re.escape, values))})\b", re.IGNORECASE), placeholders
+
+
+def pattern_key(pattern: str) -> str:
+    # Patterns that only differ by case, spacing or final punctuation train the classifier the same way
+    return " ".join(pattern.lower().rstrip("?!. ").split())
+
+
+def suggest_patterns(records: list[dict], known_patterns=(), entity_patterns: dict[str, list[str]] | None = None,
+                     min_count=1) -> list[CandidatePattern]:
+    """
+    Group the logged messages by pattern and rank the patterns intents.json doesn't have yet.
+
+    Args:
+        records: Records of the exceptions log, see read_exception_log
+        known_patterns: Patterns already in intents.json, they aren't suggested again
+        entity_patterns: Entity label -> known values, replaced by their placeholder where the log didn't record
+            the message's entities, such as in the old plain text log
+        min_count: Times a pattern must have been logged to be suggested
+    """
+    known = {pattern_key(pattern) for pattern in known_patterns}
+    matcher, placeholders = entity_matcher(entity_patterns) if entity_patterns else (None, {})
+    groups: dict[str, list[tuple[str, dict]]] = defaultdict(list)
+    for record in records:
+        message = record["message"].strip()
+        # Commands like /debug aren't questions
+        if not message or message.startswith("/"):
+            continue
+        pattern = to_pattern(message, record.get("entities") or {})
+        if matcher is not None:
+            pattern = matcher.sub(lambda match: placeholders[match[0].lower()], pattern)
+        key = pattern_key(pattern)
+        if key and key not in known:
+            groups[key].append((pattern, record))
+
+    candidates = []
+    for group in groups.values():
+        if len(group) < min_count:
+            continue
+        tags = Counter(record.get("predicted_tag") for _, record in group)
+        candidates.append(CandidatePattern(
+            pattern=Counter(pattern for pattern, _ in group).most_common(1)[0][0],
+            tag=tags.most_common(1)[0][0],
+            count=len(group),
+            mean_confidence=sum(record.get("confidence", 0.0) for _, record in group) / len(group),
+            examples=list(dict.fromkeys(record["message"] for _, record in group))[:3],
+        ))
+    candidates.sort(key=lambda candidate: (-candidate.count, candidate.pattern))
+    return candidates
+
+
+def as_intents(candidates: list[CandidatePattern]) -> dict:
+    """Candidates in the intents.json layout, grouped by tag, so they can be reviewed and copied over."""
+    patterns_by_tag: dict[str | None, list[str]] = defaultdict(list)
+    for candidate in candidates:
+        patterns_by_tag[candidate.tag].append(candidate.pattern)
+    return {"intents": [{"tag": tag, "patterns": patterns} for tag, patterns in patterns_by_tag.items()]}
@@ -1 +1,2 @@
-from .model_data import ModelData
\ No newline at end of file
+from .model_data import ModelData
+from .numpy_intent_classifier import NumpyIntentClassifier
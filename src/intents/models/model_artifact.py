@@ -0,0 +1,91 @@
+"""
+Single file binary format for the trained intent model
+
+Layout:
+    MAGIC, format version (uint32), header length (uint32)
+    UTF-8 JSON header: metadata plus the dtype, shape and offset of every array
+    arrays, each starting on an ARRAY_ALIGNMENT byte boundary
+
+Arrays are returned as views of a read only memory map of the file, so loading copies nothing.
+"""
+import hashlib
+import json
+import struct
+import numpy as np
+from utils.atomic_write import atomic_write
+
+MAGIC = b"DNDINTNT"
+# Bump when the layout or the header keys change, older artifacts are retrained
+FORMAT_VERSION = 1
+ARRAY_ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def content_hash(path) -> str:
+    """sha256 of a file's bytes, stored in the artifact to tell if it was trained on the current file."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+
+
+def write_artifact(path, header: dict, arrays: dict[str, np.ndarray]):
+    """
+    Write the header and arrays. The header must be JSON serializable and can't have an "arrays" key.
+
+    The file is replaced rather than rewritten, running chatbots keep the weights they memory mapped.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # Array offsets depend on the header's length, which depends on the offsets, so lay the arrays out relative
+    # to the end of the header and grow the header's padding until it fits
+    layout, relative_offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": relative_offset}
+        relative_offset = _aligned(relative_offset + array.nbytes)
+
+    data_start = _aligned(_PREAMBLE.size)
+    while True:
+        full_header = {**header, "arrays": {
+            name: {**entry, "offset": data_start + entry["offset"]} for name, entry in layout.items()
+        }}
+        header_bytes = json.dumps(full_header).encode('utf-8')
+        if _PREAMBLE.size + len(header_bytes) <= data_start:
+            break
+        data_start = _aligned(_PREAMBLE.size + len(header_bytes))
+
+    with atomic_write(path) as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (full_header["arrays"][name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+
+
+def read_header(path) -> dict:
+    """Read only the header, raises ValueError if the file isn't an artifact of the current format version."""
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"{path} is not an intent model artifact.")
+        magic, version, header_length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an intent model artifact.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}. Retrain the model.")
+        return json.loads(f.read(header_length).decode('utf-8'))
+
+
+def load_artifact(path) -> tuple[dict, dict[str, np.ndarray]]:
+    """Read the header and memory map the arrays, the arrays are read only views of the file."""
+    header = read_header(path)
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, entry in header.pop("arrays").items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        arrays[name] = buffer[entry["offset"]:entry["offset"] + count * dtype.itemsize].view(dtype).reshape(entry["shape"])
+    return header, arrays
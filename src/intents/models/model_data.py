@@ -1,18 +1,23 @@
 import os
 import json
 import numpy as np
-import torch
-from .intent_classifier import IntentClassifier
+from .model_artifact import content_hash, load_artifact, read_header, write_artifact
+from .numpy_intent_classifier import NumpyIntentClassifier
 from ..utils.data_preprocessor import DataPreprocessor
 
+BACKENDS = ("numpy", "torch")
+
 class ModelData:
     def __init__(self):
+        # an IntentClassifier when trained or loaded with the torch backend, a NumpyIntentClassifier with the numpy backend
         self.intent_classifier = None
 
         # training data representing lemmatized patterns from intents.json and the tag they are associated with
         self.documents: list[tuple[list[str], str]] = []
         # a sorted list of unique lemmatized words generated from every pattern in the training data
         self.vocabulary: list[str] = []
+        # each vocabulary word mapped to its position in the bag of words
+        self.vocabulary_index: dict[str, int] = {}
         # a list of every tag in intents.json
         self.intents: list[str] = []
         # a dictionary of responses mapping each intent tag to its responses
@@ -38,46 +43,78 @@ class ModelData:
 
                 self.vocabulary = sorted(set(self.vocabulary))
 
-    def prepare_data(self):
-        bags = []
-        indices = []
-
-        for document in self.documents:
-            words = document[0]
-            bag = DataPreprocessor.bag_of_words(words, self.vocabulary)
+            self.vocabulary_index = DataPreprocessor.vocabulary_index(self.vocabulary)
 
-            intent_index = self.intents.index(document[1])
-
-            bags.append(bag)
-            indices.append(intent_index)
+    def prepare_data(self):
+        intent_indices = {intent: i for i, intent in enumerate(self.intents)}
 
-        self.X = np.array(bags)
-        self.y = np.array(indices)
+        self.X = DataPreprocessor.bags_of_words([words for words, _ in self.documents], self.vocabulary_index)
+        self.y = np.array([intent_indices[tag] for _, tag in self.documents])
         
-    def save_model(self, model_path, model_data_path):
-        torch.save(self.intent_classifier.state_dict(), model_path)
-
-        with open(model_data_path, 'w') as f:
-            json.dump({
-                'input_size': self.X.shape[1],
-                'output_size': len(self.intents),
-                'intents': self.intents,
-                'intents_responses': self.intents_responses,
-                'vocabulary': self.vocabulary
-            }, f)
+    def save_model(self, model_path, intents_hash):
+        """
+        Save the classifier's weights, the vocabulary and the intents to a single model artifact.
+
+        Args:
+            model_path: Artifact file, see model_artifact
+            intents_hash: content_hash of the intents.json the model was trained on
+        """
+        header = {
+            'intents_hash': intents_hash,
+            'input_size': self.X.shape[1],
+            'output_size': len(self.intents),
+            'intents': self.intents,
+            'intents_responses': self.intents_responses,
+        }
+        arrays = NumpyIntentClassifier.from_torch(self.intent_classifier).weights()
+        # sorted, so a word's position in the array is its position in the bag of words
+        arrays['vocabulary'] = np.array(self.vocabulary, dtype=f"<U{max(map(len, self.vocabulary), default=1)}")
+        write_artifact(model_path, header, arrays)
 
     @staticmethod
-    def load_model(model_path, model_data_path):
+    def load_model(model_path, backend="numpy", quantize=False):
+        """
+        Load a model saved with save_model, the weights are memory mapped instead of read.
+        Only the weights are zero-copy: the vocabulary is read into a list and indexed in a dict, which
+        DataPreprocessor looks words up in. It's small next to the weights.
+
+        Args:
+            backend: "numpy" classifies with NumpyIntentClassifier, "torch" with IntentClassifier
+            quantize: Use int8 weights, dynamically quantized for torch
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}.")
+
+        header, arrays = load_artifact(model_path)
         model_data = ModelData()
-        with open(model_data_path, 'r') as f:
-            data = json.load(f)
-        
-        # Load all necessary data from the saved file
-        model_data.intents = data['intents']
-        model_data.intents_responses = data['intents_responses']
-        model_data.vocabulary = data['vocabulary']
-
-        model_data.intent_classifier = IntentClassifier(data['input_size'], data['output_size'])
-        model_data.intent_classifier.load_state_dict(torch.load(model_path, weights_only=True))
+        model_data.intents = header['intents']
+        model_data.intents_responses = header['intents_responses']
+        # copied out of the mapped file, the dict lookups in the bag of words are faster than searching the array
+        model_data.vocabulary = arrays.pop('vocabulary').tolist()
+        model_data.vocabulary_index = DataPreprocessor.vocabulary_index(model_data.vocabulary)
+
+        if backend == "numpy":
+            model_data.intent_classifier = NumpyIntentClassifier(arrays)
+            if quantize:
+                model_data.intent_classifier = model_data.intent_classifier.quantized()
+            return model_data
+
+        import torch
+        from .intent_classifier import IntentClassifier
+        model_data.intent_classifier = IntentClassifier(header['input_size'], header['output_size'])
+        model_data.intent_classifier.load_state_dict({name: torch.from_numpy(np.array(array)) for name, array in arrays.items()})
+        if quantize:
+            model_data.intent_classifier = torch.ao.quantization.quantize_dynamic(
+                model_data.intent_classifier.eval(), {torch.nn.Linear}, dtype=torch.qint8
+            )
 
         return model_data
+
+    @staticmethod
+    def is_stale(model_path, intents_path) -> bool:
+        """True if the model is missing, from an older artifact format or trained on a different intents.json"""
+        try:
+            header = read_header(model_path)
+        except (OSError, ValueError):
+            return True
+        return header.get('intents_hash') != content_hash(intents_path)
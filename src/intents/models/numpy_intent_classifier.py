@@ -0,0 +1,78 @@
+import numpy as np
+
+# fc layers of IntentClassifier in forward order
+LAYERS = ("fc1", "fc2", "fc3")
+
+class NumpyIntentClassifier:
+    """
+    Inference only copy of IntentClassifier that runs on NumPy, so the chatbot can classify intents without importing torch.
+
+    Applies the same linear layers and ReLUs as IntentClassifier.forward in eval mode, dropout is skipped.
+    """
+
+    def __init__(self, weights: dict[str, np.ndarray]):
+        """
+        Args:
+            weights: "<layer>.weight" and "<layer>.bias" for each layer in LAYERS, weights are (out, in) like torch
+        """
+        # (weight, per output scale, bias) per layer, weights are used transposed so a batch of bags is multiplied
+        # without copying them, float32 weights memory mapped from the model artifact stay memory mapped.
+        # The scale is None for float32 weights and set for int8 weights
+        self.layers: list[tuple[np.ndarray, np.ndarray | None, np.ndarray]] = [
+            (np.asarray(weights[f"{layer}.weight"], dtype=np.float32).T, None, np.asarray(weights[f"{layer}.bias"], dtype=np.float32))
+            for layer in LAYERS
+        ]
+
+    @staticmethod
+    def from_torch(intent_classifier) -> "NumpyIntentClassifier":
+        state_dict = intent_classifier.state_dict()
+        return NumpyIntentClassifier({
+            name: state_dict[name].detach().cpu().numpy()
+            for layer in LAYERS for name in (f"{layer}.weight", f"{layer}.bias")
+        })
+
+    def weights(self) -> dict[str, np.ndarray]:
+        """Float32 weights in the layout taken by __init__, int8 weights are dequantized."""
+        weights = {}
+        for layer, (weight, scale, bias) in zip(LAYERS, self.layers):
+            weights[f"{layer}.weight"] = (weight * scale if scale is not None else weight).T
+            weights[f"{layer}.bias"] = bias
+        return weights
+
+    def quantized(self) -> "NumpyIntentClassifier":
+        """
+        Copy with symmetric int8 weights and a float32 scale per output unit, a quarter of the memory.
+
+        Only the weights are quantized, activations and biases stay float32.
+        """
+        quantized = NumpyIntentClassifier(self.weights())
+        layers = []
+        for weight, _, bias in quantized.layers:
+            scale = np.abs(weight).max(axis=0) / 127
+            scale[scale == 0] = 1
+            layers.append((np.round(weight / scale).astype(np.int8), scale.astype(np.float32), bias))
+        quantized.layers = layers
+        return quantized
+
+    @property
+    def input_size(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    def logits(self, bags: np.ndarray) -> np.ndarray:
+        x = bags
+        for i, (weight, scale, bias) in enumerate(self.layers):
+            x = x @ weight
+            if scale is not None:
+                x *= scale
+            x += bias
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def predict_proba(self, bags: np.ndarray) -> np.ndarray:
+        """Softmax over the intents for each row of bags."""
+        logits = self.logits(bags)
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
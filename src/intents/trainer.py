@@ -1,47 +1,196 @@
+import copy
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import torch
 from torch import nn, optim
-from torch.utils.data import DataLoader, TensorDataset
 from .models.intent_classifier import IntentClassifier
+from .models.model_artifact import content_hash
 from .models.model_data import ModelData
+from .models.numpy_intent_classifier import NumpyIntentClassifier
+
+
+def _accuracy(intent_classifier, X, y) -> float:
+    intent_classifier.eval()
+    with torch.no_grad():
+        return (intent_classifier(X).argmax(dim=1) == y).float().mean().item()
+
+
+def _fit(X, y, output_size, batch_size, lr, epochs, X_val=None, y_val=None, patience=10, seed=0):
+    """
+    Train an IntentClassifier on tensors, shuffled with a permutation per epoch instead of a DataLoader.
+
+    With a validation set training stops once the validation loss hasn't improved for patience epochs,
+    and the weights from the best epoch are restored.
+
+    Returns:
+        (intent classifier, best epoch, number of epochs run, mean training loss of the last epoch)
+    """
+    generator = torch.Generator().manual_seed(seed)
+    torch.manual_seed(seed)
+    intent_classifier = IntentClassifier(X.shape[1], output_size)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(intent_classifier.parameters(), lr=lr)
+    batch_size = batch_size or len(X)
+    validate = X_val is not None and len(X_val) > 0
+
+    best_loss, best_epoch, best_state = float('inf'), epochs, None
+    for epoch in range(1, epochs + 1):
+        intent_classifier.train()
+        permutation = torch.randperm(len(X), generator=generator)
+        running_loss = 0.0
+        batches = 0
+        for start in range(0, len(X), batch_size):
+            indices = permutation[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = criterion(intent_classifier(X[indices]), y[indices])
+            loss.backward()
+            optimizer.step()
+            # item() so the autograd graph of each batch is freed
+            running_loss += loss.item()
+            batches += 1
+
+        train_loss = running_loss / batches
+        if not validate:
+            continue
+
+        intent_classifier.eval()
+        with torch.no_grad():
+            val_loss = criterion(intent_classifier(X_val), y_val).item()
+        if val_loss < best_loss:
+            best_loss, best_epoch = val_loss, epoch
+            best_state = copy.deepcopy(intent_classifier.state_dict())
+        elif epoch - best_epoch >= patience:
+            break
+
+    if best_state is not None:
+        intent_classifier.load_state_dict(best_state)
+    return intent_classifier, best_epoch, epoch, train_loss
+
+
+def _stratified_split(y: np.ndarray, validation_split: float, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Split indices into training and validation, taking validation_split of each intent's patterns.
+
+    Every intent keeps at least one pattern for training, so intents with a single pattern are never held out.
+    """
+    rng = np.random.default_rng(seed)
+    train_indices, val_indices = [], []
+    for label in np.unique(y):
+        indices = rng.permutation(np.flatnonzero(y == label))
+        held_out = min(int(round(len(indices) * validation_split)), len(indices) - 1)
+        val_indices.extend(indices[:held_out])
+        train_indices.extend(indices[held_out:])
+    return np.sort(np.array(train_indices, dtype=np.intp)), np.sort(np.array(val_indices, dtype=np.intp))
+
+
+def _cross_validate(X, y, output_size, params, folds, seed) -> tuple[dict, float, float]:
+    """Mean and standard deviation of the validation accuracy of params over k folds, runs in a worker process."""
+    # the pool already runs a model per core
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(seed)
+    # stratified folds: deal each intent's shuffled patterns round robin
+    fold_of = np.empty(len(y), dtype=np.intp)
+    for label in np.unique(y):
+        indices = rng.permutation(np.flatnonzero(y == label))
+        fold_of[indices] = np.arange(len(indices)) % folds
+
+    X_tensor = torch.tensor(X, dtype=torch.float32)
+    y_tensor = torch.tensor(y, dtype=torch.long)
+    accuracies = []
+    for fold in range(folds):
+        train_mask = torch.from_numpy(fold_of != fold)
+        val_mask = ~train_mask
+        if not val_mask.any():
+            continue
+        intent_classifier, _, _, _ = _fit(
+            X_tensor[train_mask], y_tensor[train_mask], output_size,
+            params["batch_size"], params["lr"], params["epochs"], seed=seed
+        )
+        accuracies.append(_accuracy(intent_classifier, X_tensor[val_mask], y_tensor[val_mask]))
+    return params, float(np.mean(accuracies)), float(np.std(accuracies))
+
 
 class Trainer:
     def __init__(self, intents_path):
         self.model_data = ModelData();
         self.intents_path: str = intents_path
 
-    def train_model(self, batch_size, lr, epochs):
+    def train_model(self, batch_size, lr, epochs, validation_split=0.2, patience=10, seed=0):
+        """
+        Train the intent classifier.
+
+        Args:
+            batch_size: Patterns per optimizer step, None trains on every pattern at once
+            epochs: Maximum number of epochs
+            validation_split: Share of each intent's patterns held out to stop training early, 0 trains every epoch
+                on all the patterns. The held out patterns are trained on again for the best number of epochs
+                once it's known, so the saved model has seen every pattern
+            patience: Epochs without a lower validation loss before training stops
+        """
         X_tensor = torch.tensor(self.model_data.X, dtype=torch.float32)
         y_tensor = torch.tensor(self.model_data.y, dtype=torch.long)
+        output_size = len(self.model_data.intents)
 
-        dataset = TensorDataset(X_tensor, y_tensor)
-        loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+        if validation_split > 0:
+            train_indices, val_indices = _stratified_split(self.model_data.y, validation_split, seed)
+            intent_classifier, best_epoch, epochs_run, _ = _fit(
+                X_tensor[train_indices], y_tensor[train_indices], output_size, batch_size, lr, epochs,
+                X_tensor[val_indices], y_tensor[val_indices], patience, seed
+            )
+            if len(val_indices):
+                accuracy = _accuracy(intent_classifier, X_tensor[val_indices], y_tensor[val_indices])
+                print(f"Stopped after {epochs_run} epochs, best epoch {best_epoch}: "
+                      f"{accuracy:.2%} accuracy on {len(val_indices)} held out patterns")
+            epochs = best_epoch
 
-        self.model_data.intent_classifier = IntentClassifier(self.model_data.X.shape[1], len(self.model_data.intents))
+        self.model_data.intent_classifier, _, _, train_loss = _fit(X_tensor, y_tensor, output_size, batch_size, lr, epochs, seed=seed)
+        print(f"Trained on all {len(X_tensor)} patterns for {epochs} epochs: Loss: {train_loss:.4f}, "
+              f"{_accuracy(self.model_data.intent_classifier, X_tensor, y_tensor):.2%} training accuracy")
 
-        criterion = nn.CrossEntropyLoss()
-        optimizer = optim.Adam(self.model_data.intent_classifier.parameters(), lr=lr)
+    def search_hyperparameters(self, param_grid: dict[str, list], folds=5, max_workers=None, seed=0) -> list[tuple[dict, float, float]]:
+        """
+        Cross validate every combination in param_grid, each combination in its own process.
 
-        for epoch in range(epochs):
-            running_loss = 0.0
+        Args:
+            param_grid: Candidate values for "batch_size", "lr" and "epochs"
+            folds: Number of stratified folds, intents with fewer patterns are left out of some folds' validation
 
-            for batch_X, batch_y in loader:
-                optimizer.zero_grad()
-                outputs = self.model_data.intent_classifier(batch_X)
-                loss = criterion(outputs, batch_y)
-                loss.backward()
-                optimizer.step()
-                running_loss += loss
+        Returns:
+            (params, mean validation accuracy, standard deviation) for each combination, best first
+        """
+        names = list(param_grid.keys())
+        combinations = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+        output_size = len(self.model_data.intents)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_cross_validate, self.model_data.X, self.model_data.y, output_size, params, folds, seed)
+                for params in combinations
+            ]
+            results = [future.result() for future in futures]
+        return sorted(results, key=lambda result: (-result[1], result[2]))
 
-            print(f"Epoch {epoch+1}: Loss: {running_loss / len(loader):.4f}")
+    def check_numpy_inference(self):
+        """Compare the NumPy inference path with torch on the training set."""
+        X_tensor = torch.tensor(self.model_data.X, dtype=torch.float32)
+        self.model_data.intent_classifier.eval()
+        with torch.no_grad():
+            torch_probabilities = torch.softmax(self.model_data.intent_classifier(X_tensor), dim=1).numpy()
+        numpy_probabilities = NumpyIntentClassifier.from_torch(self.model_data.intent_classifier).predict_proba(self.model_data.X)
 
+        matches = int((torch_probabilities.argmax(axis=1) == numpy_probabilities.argmax(axis=1)).sum())
+        max_difference = float(abs(torch_probabilities - numpy_probabilities).max()) if len(self.model_data.X) else 0.0
+        print(f"NumPy inference matches torch on {matches}/{len(self.model_data.X)} training patterns (max probability difference {max_difference:.2e})")
+        return matches == len(self.model_data.X)
 
-    def train_and_save(self, model_path, model_data_path, intents_path):
+    def train_and_save(self, model_path, intents_path):
         self.model_data.parse_intents(intents_path)
         self.model_data.prepare_data()
         self.train_model(batch_size=8, lr=0.001, epochs=100)
 
         self.model_data.save_model(
             model_path,
-            model_data_path
+            content_hash(intents_path)
         )
+        self.check_numpy_inference()
         print("Model retrained and saved.")
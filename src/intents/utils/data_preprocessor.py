@@ -1,16 +1,44 @@
+from functools import lru_cache
 import nltk
+import numpy as np
 
-nltk.download('punkt_tab', quiet=True)
-nltk.download('wordnet', quiet=True)
+# The NLTK data is downloaded by utils.nltk_data.download_nltk_data when training
+_lemmatizer = nltk.WordNetLemmatizer()
+
+@lru_cache(maxsize=16384)
+def _lemmatize(token: str) -> str:
+    # Tokens repeat heavily across patterns and messages so each one only goes through WordNet once
+    return _lemmatizer.lemmatize(token)
 
 class DataPreprocessor:    
     @staticmethod
     def tokenize_and_lemmatize(text):
-        lemmatizer = nltk.WordNetLemmatizer()
         words = nltk.word_tokenize(text)
-        words = [lemmatizer.lemmatize(word.lower()) for word in words if any(c.isalnum() for c in word)]
+        words = [_lemmatize(word.lower()) for word in words if any(c.isalnum() for c in word)]
         return words
-    
+
+    @staticmethod
+    def vocabulary_index(vocabulary: list[str]) -> dict[str, int]:
+        """Map each vocabulary word to its position in the bag of words."""
+        return {word: i for i, word in enumerate(vocabulary)}
+
+    @staticmethod
+    def word_indices(words, vocabulary_index: dict[str, int]) -> np.ndarray:
+        """Bag of words positions of the known words, unknown words are ignored."""
+        return np.fromiter({vocabulary_index[word] for word in words if word in vocabulary_index}, dtype=np.intp)
+
+    @staticmethod
+    def bag_of_words(words, vocabulary_index: dict[str, int]) -> np.ndarray:
+        bag = np.zeros(len(vocabulary_index), dtype=np.float32)
+        bag[DataPreprocessor.word_indices(words, vocabulary_index)] = 1
+        return bag
+
     @staticmethod
-    def bag_of_words(words, vocabulary):
-        return [1 if word in words else 0 for word in vocabulary]
\ No newline at end of file
+    def bags_of_words(documents, vocabulary_index: dict[str, int]) -> np.ndarray:
+        """Bag of words matrix with one row per list of words, filled in a single scatter."""
+        indices = [DataPreprocessor.word_indices(words, vocabulary_index) for words in documents]
+        rows = np.repeat(np.arange(len(indices)), [len(row_indices) for row_indices in indices])
+        bags = np.zeros((len(indices), len(vocabulary_index)), dtype=np.float32)
+        if len(rows):
+            bags[rows, np.concatenate(indices)] = 1
+        return bags
@@ -1,31 +1,49 @@
-import os
+import argparse
+import time
+start_time = time.perf_counter()
+
 from chatbot_dnd_spells import Chatbot
+from chatbot_dnd_spells.chatbot_config import SERVING_PROFILES
+from chatbot_dnd_spells import transcript_replay
+from intents.models import ModelData
 
-def need_to_train(model_path, model_data_path, intents_path) -> bool:
-    """Check if the intents file has been modified since the model was last trained"""
-    # If model doesn't exist, it needs to be trained
-    if not model_path.exists() or not model_data_path.exists():
-        return True
-        
-    # Compare modification timestamps
-    intents_mtime = os.path.getmtime(intents_path)
-    model_mtime = os.path.getmtime(model_path)
-    
-    # Return True if intents file is newer than model file
-    return intents_mtime > model_mtime
+def need_to_train(model_path, intents_path) -> bool:
+    """Check if the intents file has changed since the model was last trained"""
+    # Compares the hash of intents.json stored in the model, timestamps aren't kept by copies and image builds
+    return ModelData.is_stale(model_path, intents_path)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat about D&D spells")
+    parser.add_argument("--profile", choices=SERVING_PROFILES.keys(), default="default",
+                        help="serving profile, 'packed' quantizes the models to int8 and runs torch on one thread")
+    parser.add_argument("--replay", metavar="TRANSCRIPT",
+                        help="replay a transcript file instead of chatting and print the latency of each stage of a turn")
+    parser.add_argument("--replay-output", metavar="JSON", help="with --replay, also save every turn and its timings")
+    args = parser.parse_args()
+
     try:
-        chatbot = Chatbot()
-        if need_to_train(chatbot.config.model_path, chatbot.config.model_data_path, chatbot.config.intents_path):
+        chatbot = Chatbot(args.profile)
+        if need_to_train(chatbot.config.model_path, chatbot.config.intents_path):
             print("The model is out of date. Train it by running train.py")
             exit()
         else:
             chatbot.load()
+            print(f"Startup took {time.perf_counter() - start_time:.2f}s ({chatbot.load_time:.2f}s loading models and data)")
     except Exception as e:
         print(f"Error occurred during initialization: {e}")
         exit()
 
+    if args.replay:
+        # Load the embedding model up front so the first vector search isn't charged for it
+        chatbot.vector_searcher.load_model()
+        conversations = transcript_replay.replay(chatbot, transcript_replay.read_transcript(args.replay))
+        turns = [turn for conversation in conversations for turn in conversation]
+        transcript_replay.print_breakdown(transcript_replay.stage_breakdown(turns), len(turns))
+        if args.replay_output:
+            transcript_replay.save_turns(args.replay_output, conversations)
+        chatbot.close()
+        exit()
+
     chatbot.run()
     try:
         chatbot.run()
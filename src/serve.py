@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+import time
+start_time = time.perf_counter()
+
+from chatbot_dnd_spells import Chatbot
+from chatbot_dnd_spells.chat_server import ChatServer
+from chatbot_dnd_spells.chatbot_config import SERVING_PROFILES
+from intents.models import ModelData
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve D&D spell chat sessions over a line protocol socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="threads answering turns")
+    parser.add_argument("--session-ttl", type=float, default=1800.0, help="seconds before an idle session is dropped")
+    parser.add_argument("--profile", choices=SERVING_PROFILES.keys(), default="default",
+                        help="serving profile, 'packed' quantizes the models to int8 and runs torch on one thread")
+    args = parser.parse_args()
+
+    chatbot = Chatbot(args.profile)
+    if ModelData.is_stale(chatbot.config.model_path, chatbot.config.intents_path):
+        print("The model is out of date. Train it by running train.py")
+        exit()
+    chatbot.load()
+    # the first vector search shouldn't wait for the embedding model
+    chatbot.vector_searcher.preload()
+    print(f"Startup took {time.perf_counter() - start_time:.2f}s ({chatbot.load_time:.2f}s loading models and data)")
+
+    server = ChatServer(chatbot, args.host, args.port, args.workers, args.session_ttl)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        chatbot.close()
@@ -1,6 +1,8 @@
 from chatbot_dnd_spells import ChatbotTrainer
+from utils.nltk_data import download_nltk_data
 
 if __name__ == "__main__":
+    download_nltk_data()
     trainer = ChatbotTrainer()
     # setup artifacts directory
     trainer.config.artifacts_dir.mkdir(exist_ok=True)
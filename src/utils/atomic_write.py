@@ -0,0 +1,29 @@
+"""
+Replace files that other processes may have open or memory mapped
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+@contextmanager
+def atomic_write(path, mode='wb', encoding=None):
+    """
+    Open a temporary file next to path for writing, and move it onto path once it's written and synced.
+
+    Readers see either the old file or the new one, never a partly written one, and memory maps of the old
+    file stay valid since its data is only freed once they're closed. Nothing is replaced if writing raises.
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates the file readable by its owner only, keep the permissions a plain open would give
+        os.chmod(temp_path, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,24 @@
+"""
+One time setup of the NLTK data used for tokenizing and lemmatizing
+"""
+import nltk
+
+# nltk.data.find path -> nltk.download package
+NLTK_RESOURCES = {
+    'tokenizers/punkt_tab': 'punkt_tab',
+    'corpora/wordnet': 'wordnet',
+}
+
+def download_nltk_data():
+    """
+    Download the NLTK data that isn't installed yet, doesn't touch the network when everything is present.
+
+    Raises LookupError if some of it isn't installed and can't be downloaded.
+    """
+    for resource, package in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            if not nltk.download(package, quiet=True):
+                raise LookupError(f"The NLTK data '{package}' isn't installed and couldn't be downloaded. "
+                                  f"Install it with: python -m nltk.downloader {package}") from None
@@ -0,0 +1,81 @@
+"""
+Bounded LRU cache with time based expiry
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get when a key is missing so None can be cached
+MISSING = object()
+
+class TTLCache:
+    def __init__(self, max_size=512, ttl=3600.0):
+        """
+        Args:
+            max_size: Maximum number of items kept, least recently used are evicted first
+            ttl: Seconds an item stays valid after it was stored, None to never expire
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key, MISSING)
+            if item is not MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+            self.misses += 1
+            return default
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._items.get(key, MISSING)
+            return item is not MISSING and (item[1] is None or item[1] > time.monotonic())
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def evict_expired(self) -> int:
+        """Remove every expired item now instead of when it's next looked up, returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._items.items() if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._items[key]
+        return len(expired)
+
+    def items(self) -> list[tuple]:
+        """(key, value) of every item that hasn't expired, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, expires_at) in self._items.items() if expires_at is None or expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def __len__(self):
+        return len(self._items)
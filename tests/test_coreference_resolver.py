@@ -0,0 +1,67 @@
+import pytest
+from coreference_resolution import ChatContext, CoreferenceResolver
+from entity_recognition import Prediction
+
+CONTEXT_VALUES = {"SPELL": "fireball", "SCHOOL": "evocation", "DAMAGE_TYPE": "fire", "CLASS": "wizard", "LEVEL": "3rd level"}
+
+
+def resolver_with(*labels):
+    chat_context = ChatContext()
+    for label in labels:
+        chat_context.update_context(Prediction(label, CONTEXT_VALUES[label], 95.0))
+    return CoreferenceResolver(chat_context)
+
+
+@pytest.mark.parametrize("message", ["how much damage does it do", "what about that", "IT"])
+def test_generic_pronoun_resolves_every_known_type(message):
+    resolver = resolver_with("SPELL", "CLASS")
+    assert resolver.resolve_coreferences(message) == {"SPELL": "fireball", "CLASS": "wizard"}
+
+
+def test_generic_pronoun_without_spell_in_context():
+    resolver = resolver_with("DAMAGE_TYPE", "LEVEL")
+    assert resolver.resolve_coreferences("what spells use that") == {"DAMAGE_TYPE": "fire", "LEVEL": "3rd level"}
+
+
+def test_this_only_refers_to_spells():
+    resolver = resolver_with("SPELL", "SCHOOL")
+    assert resolver.resolve_coreferences("is this concentration") == {"SPELL": "fireball"}
+    assert resolver_with("SCHOOL").resolve_coreferences("is this concentration") == {}
+
+
+def test_nested_pronoun_also_counts_as_the_pronoun_inside_it():
+    resolver = resolver_with(*CONTEXT_VALUES)
+    # "that spell" contains "that", which every type can be referred to by
+    assert resolver.resolve_coreferences("does that spell scale") == CONTEXT_VALUES
+    # "this type" refers to a damage type, and its "this" to a spell
+    assert resolver.resolve_coreferences("which spells deal this type") == {"SPELL": "fireball", "DAMAGE_TYPE": "fire"}
+
+
+def test_specific_pronoun_only_resolves_its_type():
+    resolver = resolver_with(*CONTEXT_VALUES)
+    assert resolver.resolve_coreferences("what spells are in the school") == {"SCHOOL": "evocation"}
+    assert resolver.resolve_coreferences("what about the one with the class") == {"SPELL": "fireball", "CLASS": "wizard"}
+
+
+def test_specific_pronoun_without_its_type_in_context():
+    assert resolver_with("SPELL").resolve_coreferences("other spells of the damage type") == {}
+
+
+@pytest.mark.parametrize("message", ["what's its range", "Its range?"])
+def test_its_only_refers_to_spells(message):
+    assert resolver_with(*CONTEXT_VALUES).resolve_coreferences(message) == {"SPELL": "fireball"}
+
+
+@pytest.mark.parametrize("message", ["a thatch roof", "itself", "thisspell", "Tell me about fireball"])
+def test_pronouns_only_match_whole_words(message):
+    assert resolver_with(*CONTEXT_VALUES).resolve_coreferences(message) == {}
+
+
+def test_every_type_resolved_when_all_are_known():
+    resolver = resolver_with(*CONTEXT_VALUES)
+    assert resolver.resolve_coreferences("what about that") == CONTEXT_VALUES
+    assert resolver.resolve_coreferences("what about it") == CONTEXT_VALUES
+
+
+def test_empty_context_resolves_nothing():
+    assert resolver_with().resolve_coreferences("what about that spell") == {}